@@ -3,7 +3,6 @@
 from typing import Type, Union
 import argparse
 import pathlib
-from .lib.tk import TwitchBotLogApp
 from .lib.logger import setup_logger
 from .run import run_async_tasks
 
@@ -31,6 +30,8 @@ def run_tk(debug: bool, log_file_path: Union[Type[pathlib.Path], None]) -> None:
     :param debug: If logging should be set to debug level
     :param log_file_path: The file path to use if logging should go to a file
     """
+    # Imported here so console mode doesn't have to load tkinter
+    from .lib.tk import TwitchBotLogApp
     app = TwitchBotLogApp(debug, log_file_path)
     app.mainloop()
 
@@ -1,12 +1,12 @@
 """Dispatch messages between Twitch chat, plugins and websockets servers
 """
-from typing import List, Dict, Tuple
+from typing import Callable, List, Dict, Tuple
 from logging import Logger
 import asyncio
-from asyncio import PriorityQueue
+from asyncio import Queue
 import re
 from .plugins import BasePlugin
-from .twitch_helix import get_emote_sets
+from .twitch_helix import iter_emote_sets
 
 
 class Dispatcher:
@@ -20,8 +20,8 @@ class Dispatcher:
         TwitchChat object
     :param logger: A logger object
     """
-    def __init__(self, chat_rcv_queue: PriorityQueue,
-                 chat_send_queue: PriorityQueue,
+    def __init__(self, chat_rcv_queue: Queue,
+                 chat_send_queue: Queue,
                  plugins: List[BasePlugin],
                  logger: Logger) -> None:
         self.chat_rcv_queue = chat_rcv_queue
@@ -36,6 +36,23 @@ class Dispatcher:
         self.room_state: Dict = {}
         for plugin in self.plugins:
             plugin.dispatcher = self
+        # The plugins don't change while running, so find the handlers for
+        # each message type once rather than for every message
+        self._privmsg_handlers = self._plugin_handlers('do_privmsg')
+        self._clearchat_handlers = self._plugin_handlers('do_clearchat')
+        self._clearmsg_handlers = self._plugin_handlers('do_clearmsg')
+        self._roomstate_handlers = self._plugin_handlers('do_roomstate')
+        self._userstate_handlers = self._plugin_handlers('do_userstate')
+
+    def _plugin_handlers(self, method: str) -> Tuple[Callable, ...]:
+        """Get the bound handler methods of the plugins that implement a
+        method
+
+        :param method: The name of the method, e.g. do_privmsg
+        :return: The plugins' bound methods
+        """
+        return tuple(getattr(plugin, method) for plugin in self.plugins
+                     if hasattr(plugin, method))
 
     async def run(self) -> None:
         """Run the dispatcher queue
@@ -49,7 +66,7 @@ class Dispatcher:
         self.logger.info('dispatcher.py: Shutting down the Dispatcher')
         self._process_queue = False
         # Make sure we're not stuck waiting on the queues
-        await self.chat_rcv_queue.put((0, 'SHUTDOWN'))
+        await self.chat_rcv_queue.put('SHUTDOWN')
 
     async def _process_receive_queue(self) -> None:
         """Read messages from the chat queue and dispatch them to plugins
@@ -57,9 +74,7 @@ class Dispatcher:
         self.logger.debug('dispatcher.py: Starting Dispatcher receive queue')
         while self._process_queue:
             message = await self.chat_rcv_queue.get()
-            # It's a priority queue, so get just the message
-            message = message[1]
-            self.logger.debug(f"dispatcher.py: message: {message}")
+            self.logger.debug('dispatcher.py: message: %s', message)
             if 'PRIVMSG #' in message:
                 asyncio.create_task(self._send_privmsg(message))
             elif 'CLEARCHAT #' in message:
@@ -93,7 +108,7 @@ class Dispatcher:
 
         :param message: The message to send back to chat.
         """
-        asyncio.create_task(self.chat_send_queue.put((0, message)))
+        self.chat_send_queue.put_nowait(message)
         tags = [f"{x}={y}" for x, y in self.user_state.items()]
         emotes = []
         for emote, emote_id in self.user_emotes.items():
@@ -108,7 +123,7 @@ class Dispatcher:
         fake_message = f"@{';'.join(tags)}:{self.user}!{self.user}@" \
                        f"{self.user}.tmi.twitch.tv PRIVMSG #{self.room} :" \
                        f"{message}"
-        await self.chat_rcv_queue.put((0, fake_message))
+        await self.chat_rcv_queue.put(fake_message)
 
     @staticmethod
     def _split_message(message: str, command: str) -> Tuple[Dict, str, str]:
@@ -119,26 +134,23 @@ class Dispatcher:
         :param command: The IRC command to split the message on
         :return: A dictionary of tags, the username and the message
         """
-        tag_dict = {}
         # Find the command
         msg_start = message.find(command)
         # Everything previous to the command should be tags and the IRC user
-        # and server section. Let's do a colon split then rejoin knowing the
-        # IRC user and server section is on the end
-        parts = message[:msg_start].split(':')
-        tags = ':'.join(parts[:-1])
-        irc_user_server = parts[-1]
-        # Tags will be preceded by an @ symbol. We don't need that. Each
-        # tag is semicolon separated
+        # and server section. Tag values may contain colons, but the IRC user
+        # and server section is always after the last one
+        tags, _, irc_user_server = message[:msg_start].rpartition(':')
+        irc_user_server = irc_user_server.rstrip()
+        # Tags will be preceded by an @ symbol and followed by a space. We
+        # don't need either. Each tag is semicolon separated and in a
+        # key=value format, but may not have values
         # https://dev.twitch.tv/docs/irc/tags#privmsg-twitch-tags
-        tags = tags[1:].split(';')
-        for tag in tags:
-            # Tags are in a key=value format, but may not have values
-            tag_parts = tag.split('=')
-            tag_dict[tag_parts[0]] = tag_parts[1]
-        # Finally, the command text which we'll do the colon split and
-        # rejoin on and strip the carriage returns
-        command_text = ':'.join(message[msg_start:].split(':')[1:]).strip()
+        tag_dict = {key: value for key, _, value in
+                    (tag.partition('=') for tag in
+                     tags[1:].rstrip().split(';'))}
+        # Finally, the command text is everything after the first colon,
+        # with the carriage returns stripped
+        command_text = message[msg_start:].partition(':')[2].strip()
         return tag_dict, irc_user_server, command_text
 
     async def _send_privmsg(self, message: str) -> None:
@@ -153,12 +165,10 @@ class Dispatcher:
         # the irc_user section
         tag_dict['nickname'] = irc_user_server.split('!')[0]
         tag_dict['msg_text'] = command_text
-        self.logger.debug(f"dispatcher.py: _send_privmsg: tag_dict {tag_dict}")
-        futures = []
-        for plugin in self.plugins:
-            if hasattr(plugin, 'do_privmsg'):
-                futures.append(plugin.do_privmsg(tag_dict))
-        await asyncio.gather(*futures)
+        self.logger.debug('dispatcher.py: _send_privmsg: tag_dict %s',
+                          tag_dict)
+        await asyncio.gather(*[handler(tag_dict) for handler in
+                               self._privmsg_handlers])
 
     async def _send_clearchat(self, message: str) -> None:
         """Send the clearchat messages to all the plugins that implement
@@ -171,13 +181,10 @@ class Dispatcher:
         # If we are clearing user messages the username should be in the
         # command text
         tag_dict['username'] = command_text
-        self.logger.debug(f"dispatcher.py: _send_clearchat: tag_dict"
-                          f" {tag_dict}")
-        futures = []
-        for plugin in self.plugins:
-            if hasattr(plugin, 'do_clearchat'):
-                futures.append(plugin.do_clearchat(tag_dict))
-        await asyncio.gather(*futures)
+        self.logger.debug('dispatcher.py: _send_clearchat: tag_dict %s',
+                          tag_dict)
+        await asyncio.gather(*[handler(tag_dict) for handler in
+                               self._clearchat_handlers])
 
     async def _send_clearmsg(self, message: str) -> None:
         """Send the clearmsg messages to all the plugins that implement
@@ -189,12 +196,10 @@ class Dispatcher:
             self._split_message(message, 'CLEARMSG')
         # The message to be deleted is in the command_text
         tag_dict['msg_text'] = command_text
-        self.logger.debug(f"dispatcher.py: _send_clearmsg: tag_dict {tag_dict}")
-        futures = []
-        for plugin in self.plugins:
-            if hasattr(plugin, 'do_clearmsg'):
-                futures.append(plugin.do_clearmsg(tag_dict))
-        await asyncio.gather(*futures)
+        self.logger.debug('dispatcher.py: _send_clearmsg: tag_dict %s',
+                          tag_dict)
+        await asyncio.gather(*[handler(tag_dict) for handler in
+                               self._clearmsg_handlers])
 
     async def _send_roomstate(self, message: str) -> None:
         """Send the roomstate messages to all the plugins that implement
@@ -205,13 +210,10 @@ class Dispatcher:
         tag_dict, irc_user_server, command_text = \
             self._split_message(message, 'ROOMSTATE')
         self.room_state = tag_dict
-        self.logger.debug(f"dispatcher.py: _send_roomstate: tag_dict"
-                          f" {tag_dict}")
-        futures = []
-        for plugin in self.plugins:
-            if hasattr(plugin, 'do_roomstate'):
-                futures.append(plugin.do_roomstate(tag_dict))
-        await asyncio.gather(*futures)
+        self.logger.debug('dispatcher.py: _send_roomstate: tag_dict %s',
+                          tag_dict)
+        await asyncio.gather(*[handler(tag_dict) for handler in
+                               self._roomstate_handlers])
 
     async def _send_userstate(self, message: str) -> None:
         """Send the userstate messages to all the plugins that implement
@@ -222,14 +224,11 @@ class Dispatcher:
         tag_dict, irc_user_server, command_text = \
             self._split_message(message, 'USERSTATE')
         self.user_state = tag_dict
-        self.logger.debug(f"dispatcher.py: _send_userstate: tag_dict"
-                          f" {tag_dict}")
+        self.logger.debug('dispatcher.py: _send_userstate: tag_dict %s',
+                          tag_dict)
         asyncio.create_task(self._update_user_emotes(tag_dict))
-        futures = []
-        for plugin in self.plugins:
-            if hasattr(plugin, 'do_userstate'):
-                futures.append(plugin.do_userstate(tag_dict))
-        await asyncio.gather(*futures)
+        await asyncio.gather(*[handler(tag_dict) for handler in
+                               self._userstate_handlers])
 
     async def _update_user_emotes(self, user_state: Dict) -> None:
         """Update the user's locally stored available emotes
@@ -237,9 +236,6 @@ class Dispatcher:
         :param user_state: The tag dictionary from the USERSTATE message
         """
         emote_set_ids = user_state['emote-sets'].split(',')
-        emote_sets = await get_emote_sets(emote_set_ids, self.logger)
-        emote_dict = {}
-        for emote_set in emote_sets:
-            tmp_dict = {x['name']: x['id'] for x in emote_set}
-            emote_dict.update(tmp_dict)
-        self.user_emotes.update(emote_dict)
+        # Make each set usable as soon as it arrives
+        async for emote_set in iter_emote_sets(emote_set_ids, self.logger):
+            self.user_emotes.update({x['name']: x['id'] for x in emote_set})
@@ -3,9 +3,10 @@
 from typing import Type, TYPE_CHECKING, Union
 import pathlib
 import logging
-from tkinter import END, Text
-from datetime import datetime
+import time
+from queue import SimpleQueue, Empty
 if TYPE_CHECKING:
+    from tkinter import Text
     from .tk import TwitchBotLogApp
 
 
@@ -28,6 +29,8 @@ def setup_logger(debug: bool = False,
     logger.addHandler(console_handler)
     if app:
         text_handler = TkTextHandler(app.bot_log)
+        # The Tk widget renders the level name itself, so just the message
+        text_handler.setFormatter(logging.Formatter('%(message)s'))
         logger.addHandler(text_handler)
     if file_path:
         file_handler = logging.FileHandler(file_path)
@@ -45,13 +48,20 @@ class TkTextHandler(logging.Handler):
     Adapted from Moshe Kaplan:
     https://gist.github.com/moshekaplan/c425f861de7bbf28ef06
 
+    Records are queued and written to the widget in batches, so a burst of
+    log messages only costs one round of Tk calls.
+
     :param tk_widget: Tkinter scrolled text widget to write to
     """
 
-    def __init__(self, tk_widget: Text, *args, **kwargs) -> None:
+    def __init__(self, tk_widget: 'Text', *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
         # Store a reference to the scrolled Text it will log to
         self.tk_widget = tk_widget
+        self.tk_widget.tag_config('green_level', foreground='green')
+        self.tk_widget.tag_config('red_level', foreground='red')
+        self._records: SimpleQueue = SimpleQueue()
+        self._append_scheduled = False
 
     def emit(self, record) -> None:
         """Override the normal Handler emit method to write to a tkinter
@@ -59,25 +69,43 @@ class TkTextHandler(logging.Handler):
 
         :param record: The log record
         """
-        def append() -> None:
-            """Nested function to call in the program loop
-            """
-            msg = self.format(record)
-            self.tk_widget.configure(state='normal')
-            if record.levelname in ('INFO', 'DEBUG'):
-                self.tk_widget.insert(END, f"{record.levelname}", 'green_level')
-            else:
-                self.tk_widget.insert(END, f"{record.levelname}", 'red_level')
-            self.tk_widget.insert(END, f" - "
-                                       f"{datetime.now().strftime('%H:%M:%S')}"
-                                       f" - ", 'time')
-            self.tk_widget.insert(END, f"{msg}\n", 'message')
-
-            self.tk_widget.tag_config('green_level', foreground='green')
-            self.tk_widget.tag_config('red_level', foreground='red')
-            self.tk_widget.configure(state='disabled')
-            # Autoscroll to the bottom
-            self.tk_widget.yview(END)
+        level_tag = 'green_level' if record.levelname in ('INFO', 'DEBUG') \
+            else 'red_level'
+        time_str = time.strftime('%H:%M:%S', time.localtime(record.created))
+        self._records.put((record.levelname, level_tag, f" - {time_str} - ",
+                           f"{self.format(record)}\n"))
         # This is necessary because we can't modify the Text from other
-        # threads, we have to add it to the loop
-        self.tk_widget.after(0, append)
+        # threads, we have to add it to the loop. Only one append needs to
+        # be waiting on the loop at a time, it will pick up everything queued
+        if not self._append_scheduled:
+            # Set before scheduling, as the append could run on the Tk thread
+            # before after() returns here
+            self._append_scheduled = True
+            try:
+                self.tk_widget.after(0, self._append)
+            except Exception:  # pylint: disable=broad-except
+                # The widget may be destroyed, or Tk not running yet. Let the
+                # next record try again rather than never appending
+                self._append_scheduled = False
+                self.handleError(record)
+
+    def _append(self) -> None:
+        """Write all the queued records to the Text widget in one insert
+        """
+        self._append_scheduled = False
+        insert_args = []
+        try:
+            while True:
+                level_name, level_tag, time_str, msg = \
+                    self._records.get_nowait()
+                insert_args += [level_name, level_tag, time_str, 'time',
+                                msg, 'message']
+        except Empty:
+            pass
+        if not insert_args:
+            return
+        self.tk_widget.configure(state='normal')
+        self.tk_widget.insert('end', *insert_args)
+        self.tk_widget.configure(state='disabled')
+        # Autoscroll to the bottom
+        self.tk_widget.yview('end')
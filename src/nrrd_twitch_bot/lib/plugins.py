@@ -1,7 +1,7 @@
 """Load plugins from the config file and import them
 """
-from typing import List, Dict, Union, TYPE_CHECKING
-from asyncio import PriorityQueue, create_task
+from typing import List, Dict, Set, Union, TYPE_CHECKING
+from asyncio import Queue, QueueEmpty, QueueFull, Task, create_task
 from logging import Logger
 from inspect import getmembers, isclass
 import os
@@ -9,12 +9,46 @@ import sys
 import json
 import importlib
 import importlib.util
+from aiohttp import WSMsgType
 from aiohttp.web import Request, WebSocketResponse
 from appdirs import user_data_dir
 from .config import load_default_config
+try:
+    import orjson
+except ImportError:
+    orjson = None
 if TYPE_CHECKING:
     from .dispatcher import Dispatcher
 
+# Plugin locations already added to sys.path by this process
+_ADDED_PATHS: Set[str] = set()
+# Messages waiting for a slow overlay before it starts missing them
+WS_CLIENT_QUEUE_SIZE = 100
+
+
+class TextFrame(bytes):
+    """UTF-8 encoded text to be sent as a websocket text frame, rather than
+    the binary frame used for other bytes
+    """
+
+
+class JsonFrame(TextFrame):
+    """A UTF-8 encoded JSON message, which may be batched with others into a
+    JSON array
+    """
+
+
+def _dumps(message: Union[List, Dict]) -> JsonFrame:
+    """Compact JSON encoding for websocket messages, using orjson if it is
+    installed
+
+    :param message: The message to encode
+    :return: The UTF-8 encoded JSON
+    """
+    if orjson:
+        return JsonFrame(orjson.dumps(message))
+    return JsonFrame(json.dumps(message, separators=(',', ':')).encode())
+
 
 class BasePlugin:
     """Basic object that plugins must inherit from, providing a logger and
@@ -22,22 +56,35 @@ class BasePlugin:
 
     :param logger: A logger object
     """
+    # How many queued JSON messages may be sent to an overlay together as a
+    # single JSON array frame. Overlays must handle arrays before a plugin
+    # raises this
+    ws_batch_size = 1
+
     def __init__(self, logger: Logger) -> None:
-        self.websocket_queue: PriorityQueue = PriorityQueue()
+        # Overlays expect messages in the order they were sent, so this is a
+        # plain FIFO queue
+        self.websocket_queue: Queue = Queue()
         self.dispatcher: Union[Dispatcher, None] = None
         self.logger = logger
+        # The send queue for each connected overlay, and the task copying
+        # messages from the websocket queue to them
+        self._ws_clients: Dict[WebSocketResponse, Queue] = {}
+        self._ws_broadcast: Union[Task, None] = None
+        # Messages dropped for each overlay since its queue last had room
+        self._ws_dropped: Dict[WebSocketResponse, int] = {}
 
     async def send_web_socket(self, message: Union[List, Dict, str, bytes]):
         """Send a message to the Websockets server for overlays
 
         :param message: The message to send to the websockets
         """
-        # If multiple messages are in the queue with the same priority,
-        # the values are compared, which cannot be done with dict objects,
-        # so do a conversion to a JSON string here.
+        # Encode messages once here, rather than for every overlay
         if isinstance(message, (list, dict)):
-            message = json.dumps(message)
-        await self.websocket_queue.put((0, message))
+            message = _dumps(message)
+        elif isinstance(message, str):
+            message = TextFrame(message.encode())
+        await self.websocket_queue.put(message)
 
     async def _websocket_handler(self, request: Request) -> WebSocketResponse:
         """A websocket handler to send messages to Overlays
@@ -49,7 +96,7 @@ class BasePlugin:
         await ws.prepare(request)
         # Add the websocket to the application registry
         request.app['websockets'].add(ws)
-        task = create_task(self._send_from_queue(ws))
+        task = self._add_ws_client(ws)
         try:
             async for msg in ws:
                 # OBS overlays would not be expected to send info back,
@@ -58,22 +105,127 @@ class BasePlugin:
                 pass
         finally:
             request.app['websockets'].discard(ws)
-            task.cancel()
+            self._remove_ws_client(ws, task)
         return ws
 
-    async def _send_from_queue(self, ws: WebSocketResponse) -> None:
-        """Send a frame to the websockets server
+    def _add_ws_client(self, ws: WebSocketResponse) -> Task:
+        """Give a newly connected overlay its own send queue, and start the
+        broadcast to the send queues if it isn't running
 
         :param ws: The WebSocketResponse object
+        :return: The task sending the overlay's queue to its websocket
         """
-        while not ws.closed:
+        client_queue: Queue = Queue(WS_CLIENT_QUEUE_SIZE)
+        self._ws_clients[ws] = client_queue
+        if self._ws_broadcast is None:
+            self._ws_broadcast = create_task(self._broadcast_from_queue())
+        return create_task(self._send_from_queue(ws, client_queue))
+
+    def _remove_ws_client(self, ws: WebSocketResponse, task: Task) -> None:
+        """Stop sending to a disconnected overlay, and stop the broadcast if
+        it was the last one
+
+        :param ws: The WebSocketResponse object
+        :param task: The task sending the overlay's queue to its websocket
+        """
+        del self._ws_clients[ws]
+        self._ws_dropped.pop(ws, None)
+        task.cancel()
+        if not self._ws_clients:
+            # Leave messages in the websocket queue for the next overlay
+            # to connect. The cancelled task isn't done until the loop gets
+            # to it, so clear it now for an overlay reconnecting before then
+            self._ws_broadcast.cancel()
+            self._ws_broadcast = None
+
+    async def _broadcast_from_queue(self) -> None:
+        """Copy each message in the websocket queue to the send queue of
+        every connected overlay, so the message is only encoded once however
+        many overlays there are
+        """
+        while True:
             message = await self.websocket_queue.get()
-            if isinstance(message[1], str):
-                await ws.send_str(message[1])
-            else:
-                await ws.send_bytes(message[1])
+            for ws, client_queue in self._ws_clients.items():
+                try:
+                    client_queue.put_nowait(message)
+                except QueueFull:
+                    dropped = self._ws_dropped.get(ws, 0) + 1
+                    self._ws_dropped[ws] = dropped
+                    # Warn once per burst rather than for every message
+                    if dropped == 1:
+                        self.logger.warning('plugins.py: Websocket %s is '
+                                            'not keeping up, dropping '
+                                            'messages', ws)
+                else:
+                    dropped = self._ws_dropped.pop(ws, 0)
+                    if dropped:
+                        self.logger.info('plugins.py: Websocket %s caught '
+                                         'up, %d messages were dropped', ws,
+                                         dropped)
             self.websocket_queue.task_done()
 
+    async def _send_from_queue(self, ws: WebSocketResponse,
+                               client_queue: Queue) -> None:
+        """Send frames from an overlay's send queue to its websocket
+
+        :param ws: The WebSocketResponse object
+        :param client_queue: The overlay's send queue
+        """
+        while not ws.closed:
+            messages = [await client_queue.get()]
+            # Pick up anything else that's already waiting, there's no delay
+            # to wait for more
+            try:
+                while len(messages) < self.ws_batch_size:
+                    messages.append(client_queue.get_nowait())
+            except QueueEmpty:
+                pass
+            batch = []
+            for message in messages:
+                if isinstance(message, JsonFrame):
+                    batch.append(message)
+                    continue
+                if batch:
+                    await _send_json_frames(ws, batch)
+                    batch = []
+                if isinstance(message, TextFrame):
+                    # The overlays JSON.parse the frame data, so encoded text
+                    # must still go out as a text frame
+                    await _send_text_frame(ws, message)
+                else:
+                    await ws.send_bytes(message)
+            if batch:
+                await _send_json_frames(ws, batch)
+
+
+async def _send_text_frame(ws: WebSocketResponse, message: TextFrame) \
+        -> None:
+    """Send already encoded text as a websocket text frame
+
+    :param ws: The WebSocketResponse object
+    :param message: The encoded text
+    """
+    if hasattr(ws, 'send_frame'):
+        # aiohttp 3.11 and later can send the bytes as they are
+        await ws.send_frame(message, WSMsgType.TEXT)
+    else:
+        await ws.send_str(message.decode())
+
+
+async def _send_json_frames(ws: WebSocketResponse, messages: List[JsonFrame]) \
+        -> None:
+    """Send JSON messages as one text frame, joining them into a JSON array if
+    there is more than one
+
+    :param ws: The WebSocketResponse object
+    :param messages: The encoded JSON messages
+    """
+    if len(messages) == 1:
+        await _send_text_frame(ws, messages[0])
+    else:
+        await _send_text_frame(ws, TextFrame(b'[' + b','.join(messages) +
+                                             b']'))
+
 
 def _load_from_config(logger: Logger) -> List[str]:
     """Load the list of plugin names from the config file
@@ -93,6 +245,10 @@ def _update_paths(logger: Logger) -> None:
 
     :param logger: A logger object
     """
+    # Both the options window and the services call this, only extend the
+    # path the first time round
+    if _ADDED_PATHS:
+        return
     logger.debug('plugins.py: Adding local plugin path')
     local_plugin_path = os.path.join(os.path.dirname(__file__), '..', 'plugins')
     user_plugin_path = os.path.join(user_data_dir('nrrd-twitch-bot', 'djnrrd'),
@@ -114,7 +270,10 @@ def _update_paths(logger: Logger) -> None:
         logger.debug(f"plugins.py: Creating plugin directory: "
                      f"{user_plugin_path}")
         os.mkdir(user_plugin_path)
-    sys.path.extend([local_plugin_path, user_plugin_path])
+    for path in (local_plugin_path, user_plugin_path):
+        if path not in _ADDED_PATHS:
+            sys.path.append(path)
+            _ADDED_PATHS.add(path)
 
 
 def load_plugins(logger: Logger) -> List[BasePlugin]:
@@ -1,6 +1,6 @@
 """"The TK application for the Twitch bot log handler
 """
-from typing import Type, Union
+from typing import Callable, Optional, Type, Union
 import pathlib
 from configparser import ConfigParser
 from logging import Logger
@@ -11,7 +11,7 @@ from tkinter import scrolledtext
 from nrrd_twitch_bot.lib.logger import setup_logger
 from nrrd_twitch_bot.lib.config import load_default_config, save_default_config
 from nrrd_twitch_bot.lib.twitch_oauth import get_twitch_oauth_token
-from nrrd_twitch_bot.run import start_new_thread
+from nrrd_twitch_bot.run import start_new_thread, stop_thread
 from nrrd_twitch_bot.lib.plugins import load_tk_plugins
 
 
@@ -27,14 +27,15 @@ class TwitchBotLogApp(tk.Tk):
         super().__init__(*args, **kwargs)
         # This custom property is required for the TK app setup
         self.run_services = tk.BooleanVar(value=False)
-        # Setup the TK app
+        # Setup the TK app, which also keeps a shortcut to the log widget
+        self.bot_log: Union[scrolledtext.ScrolledText, None] = None
         self._setup_app()
-        # Shortcut to the log widget
-        self.bot_log = self.nametowidget('log_frame.!frame.bot_log_txt')
         # Start the logger
         self.logger = setup_logger(debug, self, log_file_path)
-        # Create the asyncio event loop and shutdown message queue
-        self.shutdown_event = asyncio.Event()
+        # The asyncio event loop the services thread runs on
+        self.services_loop: Union[asyncio.AbstractEventLoop, None] = None
+        # Set once closing the app is waiting on the services to shut down
+        self._closing = False
 
     def _setup_app(self) -> None:
         """Setup the TK application and widgets
@@ -52,6 +53,7 @@ class TwitchBotLogApp(tk.Tk):
         # Main frame setup
         main_frame = LogFrame(self)
         main_frame.grid(row=0, column=0, sticky='nsew')
+        self.bot_log = main_frame.bot_log_txt
         # Menu bar setup
         self.config(menu=self._build_menu())
 
@@ -92,24 +94,47 @@ class TwitchBotLogApp(tk.Tk):
         """Launch the websocket clients and servers in a thread
         """
         self.logger.info('tk.py: Starting services in new thread')
-        start_new_thread(self.logger, self.shutdown_event)
+        self.services_loop = start_new_thread(self.logger)
 
-    def shutdown_services(self) -> None:
+    def shutdown_services(self, callback: Optional[Callable] = None) -> None:
         """Gracefully shutdown the websocket clients and servers
+
+        :param callback: Optional function to call once the services have
+            shut down
         """
         self.logger.info('tk.py: Shutting down services')
-        self.shutdown_event.set()
-        while self.shutdown_event.is_set():
-            self.update()
-        self.logger.debug('tk.py: self.loop no longer running')
+        stop_thread(self.services_loop, self.logger)
+        self._wait_for_shutdown(self.services_loop, callback)
+
+    def _wait_for_shutdown(self, loop: asyncio.AbstractEventLoop,
+                           callback: Optional[Callable] = None) -> None:
+        """Check back in on the Tk event loop until the services thread has
+        closed its event loop, rather than spinning on update()
+
+        :param loop: The services event loop being shut down. The services
+            may have been started again on a new loop in the meantime
+        :param callback: Optional function to call once the services have
+            shut down
+        """
+        if not loop.is_closed():
+            self.after(50, self._wait_for_shutdown, loop, callback)
+            return
+        self.logger.debug('tk.py: Services event loop closed')
+        if callback:
+            callback()
 
     def close_app(self) -> None:
         """Gracefully shutdown the websocket clients and servers before
         closing the tkinter app
         """
+        if self._closing:
+            # Already waiting on the services before closing
+            return
         if self.run_services.get():
-            self.shutdown_services()
-        self.destroy()
+            self._closing = True
+            self.shutdown_services(self.destroy)
+        else:
+            self.destroy()
 
 
 class LogFrame(tk.Frame):
@@ -120,6 +145,7 @@ class LogFrame(tk.Frame):
 
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(name='log_frame', *args, **kwargs)
+        self.bot_log_txt: Union[scrolledtext.ScrolledText, None] = None
         self._setup_app()
 
     def _setup_app(self) -> None:
@@ -137,6 +163,7 @@ class LogFrame(tk.Frame):
                                                bg='DarkGray')
         scroll_txt.configure(font='TkFixedFont')
         scroll_txt.grid(column=0, row=0, sticky='nsew')
+        self.bot_log_txt = scroll_txt
 
 
 class OptionsWindow(tk.Toplevel):
@@ -147,12 +174,10 @@ class OptionsWindow(tk.Toplevel):
 
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(name='options', *args, **kwargs)
+        # Shortcuts to widgets, set up by _setup_app
+        self.options_list: Union[tk.Listbox, None] = None
+        self.options_action: Union[OptionsActions, None] = None
         self._setup_app()
-        # Paths to widgets
-        self.options_list = \
-            self.nametowidget('options_frame.options_list.option_list_lbx')
-        self.options_action = \
-            self.nametowidget('options_frame.options_action')
         self.plugins = dict(load_tk_plugins(self.master.logger))
         self._load_options_list()
 
@@ -168,13 +193,14 @@ class OptionsWindow(tk.Toplevel):
         # Main frame setup
         main_frame = OptionsFrame(self)
         main_frame.grid(row=0, column=0, sticky='nsew')
+        self.options_list = main_frame.options_list.list_box
+        self.options_action = main_frame.options_action
 
     def _load_options_list(self) -> None:
         """Load the options categories in the list box
         """
-        self.options_list.insert('end', 'Twitch Login')
-        for plugin in self.plugins.keys():
-            self.options_list.insert('end', plugin)
+        # Listbox.insert takes multiple items, so add them in one Tcl call
+        self.options_list.insert('end', 'Twitch Login', *self.plugins.keys())
 
     def options_select(self, event: tk.Event) -> None:
         """Load the options section for the selected option
@@ -202,6 +228,8 @@ class OptionsFrame(tk.Frame):
 
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(name='options_frame', *args, **kwargs)
+        self.options_list: Union[OptionsList, None] = None
+        self.options_action: Union[OptionsActions, None] = None
         self._setup_app()
 
     def _setup_app(self) -> None:
@@ -214,6 +242,8 @@ class OptionsFrame(tk.Frame):
         doc_action = OptionsActions(self)
         option_list.grid(column=0, row=0, sticky='nsew')
         doc_action.grid(row=0, column=1, sticky='nsew')
+        self.options_list = option_list
+        self.options_action = doc_action
 
 
 class OptionsList(tk.Frame):
@@ -224,6 +254,7 @@ class OptionsList(tk.Frame):
 
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(name='options_list', *args, **kwargs)
+        self.list_box: Union[tk.Listbox, None] = None
         self._setup_app()
         self._make_list_box()
 
@@ -244,6 +275,7 @@ class OptionsList(tk.Frame):
         scroll.config(command=list_box.yview)
         list_box.config(yscrollcommand=scroll.set)
         list_box.bind('<<ListboxSelect>>', self.master.master.options_select)
+        self.list_box = list_box
 
 
 class OptionsActions(tk.Frame):
@@ -1,10 +1,16 @@
 """"Module for connecting to the Twitch Websockets chat service
 """
-from typing import Optional, Type, Union
+from typing import Optional, Type, Union, TYPE_CHECKING
 from types import TracebackType
 import asyncio
-from logging import Logger
-from websockets import client
+from logging import Logger, DEBUG
+if TYPE_CHECKING:
+    from websockets import client
+
+PING = 'PING :tmi.twitch.tv'
+PONG = 'PONG :tmi.twitch.tv'
+CAPABILITIES = ('twitch.tv/membership', 'twitch.tv/tags', 'twitch.tv/commands')
+CAP_REQ = f"CAP REQ :{' '.join(CAPABILITIES)}"
 
 
 class TwitchChat:
@@ -19,25 +25,29 @@ class TwitchChat:
     :param oauth_token: OAuth2 token received from Twitch
     :param nickname: Twitch username
     :param channel: Twitch channel to join
-    :param rcv_queue: An Asyncio priority queue object to send messages from
+    :param rcv_queue: An Asyncio queue object to send messages from
         twitch chat to the dispatcher
-    :param send_queue: An Asyncio priority queue object to send messages to
+    :param send_queue: An Asyncio queue object to send messages to
         twitch chat from the dispatcher
     :param logger: A logger object
     """
 
     def __init__(self, oauth_token: str, nickname: str, channel: str,
-                 rcv_queue: asyncio.PriorityQueue,
-                 send_queue: asyncio.PriorityQueue,
+                 rcv_queue: asyncio.Queue,
+                 send_queue: asyncio.Queue,
                  logger: Logger) -> None:
         self.uri: str = 'wss://irc-ws.chat.twitch.tv:443'
         self.oauth_token = oauth_token
         self.nickname = nickname
         self.channel = channel.lower()
+        # Commands that only depend on the channel are built once
+        self._join_command = f"JOIN #{self.channel}"
+        self._privmsg_prefix = f"PRIVMSG #{self.channel} :"
         self.logger = logger
-        self._session: Union[client.WebSocketClientProtocol, None] = None
+        self._session: Union['client.WebSocketClientProtocol', None] = None
         self.rcv_queue = rcv_queue
         self.send_queue = send_queue
+        self._closing: bool = False
 
     def __enter__(self) -> None:
         """Should not be using with the normal context manager"""
@@ -67,6 +77,8 @@ class TwitchChat:
         """Open a websockets client that's stored in the object"""
         self.logger.info('twitch_chat.py: Starting TwitchChat client')
         if not self._session:
+            # Imported here so it is only loaded once the services start
+            from websockets import client
             self.logger.debug('twitch_chat.py: Starting session')
             self._session = await client.connect(self.uri, logger=self.logger)
             if not await self._login():
@@ -74,15 +86,16 @@ class TwitchChat:
 
     async def close(self) -> None:
         """Close the  websockets client stored in the object"""
+        # Both a failed login and the context manager exit call this, only
+        # close the session once
+        if self._closing:
+            return
+        self._closing = True
         self.logger.info('twitch_chat.py: Shutting down TwitchChat client')
         if self._session:
-            try:
-                self.logger.debug('twitch_chat.py: Attempting to close session')
-                await self._session.close()
-            except BaseException as exception:
-                raise exception
-            finally:
-                self._session = None
+            session, self._session = self._session, None
+            self.logger.debug('twitch_chat.py: Attempting to close session')
+            await session.close()
 
     async def _login(self) -> Union[bool, None]:
         """Log into the twitch chat service, request the appropriate features
@@ -106,10 +119,10 @@ class TwitchChat:
         await self._session.send(f"PASS oauth:{self.oauth_token}")
         await self._session.send(f"NICK {self.nickname}")
         result = await self._session.recv()
-        self.logger.debug(f"twitch_chat.py: Login: {result}")
+        self.logger.debug('twitch_chat.py: Login: %s', result)
         if 'Login authentication failed' in result:
-            self.logger.error(f"twitch_chat.py: Login authentication failed: "
-                              f"{result}")
+            self.logger.error('twitch_chat.py: Login authentication failed: %s',
+                              result)
             self.logger.error('twitch_chat.py: Please check Twitch settings '
                               'and re-authorise application')
             return None
@@ -120,20 +133,15 @@ class TwitchChat:
 
         :return: True if all features were acknowledged
         """
-        await self._session.send('CAP REQ :twitch.tv/membership')
-        result = await self._session.recv()
-        self.logger.debug(f"twitch_chat.py: Req Membership: {result}")
-        if 'ACK :twitch.tv/membership' not in result:
-            return None
-        await self._session.send('CAP REQ :twitch.tv/tags')
+        # Request all the capabilities in one go to save two round trips.
+        # IRCv3 acknowledges or rejects the request as a whole.
+        await self._session.send(CAP_REQ)
         result = await self._session.recv()
-        self.logger.debug(f"twitch_chat.py: Req Tags: {result}")
-        if 'ACK :twitch.tv/tags' not in result:
+        self.logger.debug('twitch_chat.py: Req capabilities: %s', result)
+        if ' ACK :' not in result:
             return None
-        await self._session.send('CAP REQ :twitch.tv/commands')
-        result = await self._session.recv()
-        self.logger.debug(f"twitch_chat.py: Req commands: {result}")
-        if 'ACK :twitch.tv/commands' not in result:
+        acked = result.split(' ACK :', 1)[1].split()
+        if not all(cap in acked for cap in CAPABILITIES):
             return None
         return True
 
@@ -142,51 +150,63 @@ class TwitchChat:
 
         :return: True if the JOIN was successful
         """
-        await self._session.send(f"JOIN #{self.channel}")
+        await self._session.send(self._join_command)
         result = await self._session.recv()
-        self.logger.debug(f"twitch_chat.py: Join: {result}")
+        self.logger.debug('twitch_chat.py: Join: %s', result)
         # This message may or may not be multiple lines of stuff. We're only
         # concerned about the first line, the rest can go to the queue.
         results = result.split('\r\n')
-        if f"JOIN #{self.channel}" not in results[0]:
+        if self._join_command not in results[0]:
             return None
         for x in results[1:]:
             if x:
-                await self.rcv_queue.put((0, x))
+                await self.rcv_queue.put(x)
         return True
 
     async def _process_send_queue(self) -> None:
         """Send messages to the Twitch websockets server received from the
         send queue
         """
+        # Bind the attributes used on every message to locals
+        send = self._session.send
+        get = self.send_queue.get
+        task_done = self.send_queue.task_done
+        privmsg_prefix = self._privmsg_prefix
+        debug_on = self.logger.isEnabledFor(DEBUG)
         while self._session is not None:
-            message = await self.send_queue.get()
-            # It's a priority queue, so send just the message
-            message = message[1]
-            chat_command = f"PRIVMSG #{self.channel} :{message}"
-            self.logger.debug(f"twitch_chat.py: sending {chat_command}")
-            asyncio.create_task(self._session.send(chat_command))
-            self.send_queue.task_done()
+            message = await get()
+            chat_command = privmsg_prefix + message
+            if debug_on:
+                self.logger.debug('twitch_chat.py: sending %s', chat_command)
+            await send(chat_command)
+            task_done()
 
     async def _process_rcv_queue(self) -> None:
         """Send messages received from the Twitch websockets server out to
         the receive queue.
         """
-        async for frame in self._session:
+        # Bind the attributes used on every message to locals
+        session = self._session
+        put = self.rcv_queue.put_nowait
+        log_debug = self.logger.debug
+        debug_on = self.logger.isEnabledFor(DEBUG)
+        async for frame in session:
             # Messages may be multiline, split with '\r\n' and always have
-            # '\r\n' at the end of the message
-            frame = frame.strip()
-            messages = frame.split('\r\n')
-            for message in messages:
-                self.logger.debug(f"twitch_chat.py: Received {message}")
-                if message == 'PING :tmi.twitch.tv':
+            # '\r\n' at the end of the message. Don't use splitlines() as
+            # chat text can legitimately contain other line break characters
+            for message in frame.split('\r\n'):
+                if not message:
+                    continue
+                if debug_on:
+                    log_debug('twitch_chat.py: Received %s', message)
+                if message == PING:
                     # As well as the keep alive pings and pongs the websockets
                     # library manages for us, Twitch sends a specific PING
                     # message periodically
-                    asyncio.create_task(
-                        self._session.send('PONG :tmi.twitch.tv'))
+                    await session.send(PONG)
                 else:
-                    asyncio.create_task(self.rcv_queue.put((0, message)))
+                    # The queue is unbounded so this never has to wait
+                    put(message)
 
     async def run(self) -> None:
         """Run the chat session
@@ -1,11 +1,71 @@
 """Interact with the Twitch Helix API
 """
 import asyncio
-from typing import List
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Hashable, List, Mapping, Union
 from logging import Logger
+import aiohttp
 from basewebapi.asyncbasewebapi import AsyncBaseWebAPI
 from .config import load_default_config
 
+MAX_CONCURRENT_REQUESTS = 8
+# Helix accepts up to 25 emote_set_id parameters on one request
+EMOTE_SETS_PER_REQUEST = 25
+# Emote sets and badges change on the scale of days, so keep responses
+EMOTE_SET_TTL = 24 * 60 * 60.0
+EMOTE_SET_CACHE_SIZE = 1024
+BADGE_TTL = 60 * 60.0
+BADGE_CACHE_SIZE = 64
+# Keep idle connections to Helix open between the bursts of requests
+KEEPALIVE_TIMEOUT = 75
+DNS_CACHE_TTL = 300
+# How many times to retry a request Twitch rejected with 429 Too Many
+# Requests, and the longest we'll wait for the rate limit bucket to refill
+RATE_LIMIT_RETRIES = 3
+MAX_RATE_LIMIT_WAIT = 60.0
+
+
+class TTLCache:
+    """A least recently used cache where entries also expire after a set
+    time
+
+    :param ttl: How long entries are kept for, in seconds
+    :param max_size: The most entries to keep
+    """
+
+    def __init__(self, ttl: float, max_size: int) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable) -> Any:
+        """Get an entry from the cache
+
+        :param key: The cache key
+        :return: The cached value, or None if missing or expired
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] >= self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Add an entry to the cache, dropping the least recently used entry
+        if the cache is full
+
+        :param key: The cache key
+        :param value: The value to cache
+        """
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
 
 class TwitchHelix(AsyncBaseWebAPI):
     """Connect to the Twitch Helix API
@@ -15,11 +75,121 @@ class TwitchHelix(AsyncBaseWebAPI):
     :param client_id: Twitch Client ID string
     :param oauth_token: Twitch OAUTH token
     """
+    # Response caches, shared between instances
+    _emote_set_cache = TTLCache(EMOTE_SET_TTL, EMOTE_SET_CACHE_SIZE)
+    _badge_cache = TTLCache(BADGE_TTL, BADGE_CACHE_SIZE)
+    # The client shared by the module functions, see shared()
+    _shared: Union['TwitchHelix', None] = None
+    # API paths
+    _EMOTE_SET_PATH = '/helix/chat/emotes/set'
+    _GLOBAL_BADGES_PATH = '/helix/chat/badges/global'
+    _CHANNEL_BADGES_PATH = '/helix/chat/badges/'
 
     def __init__(self, client_id: str, oauth_token: str) -> None:
         super().__init__('api.twitch.tv', '', '', secure=True)
         self.headers['Client-Id'] = client_id
         self.headers['Authorization'] = f"Bearer {oauth_token}"
+        # Rate limit bucket state as last reported by Twitch
+        self._ratelimit_remaining: Union[int, None] = None
+        self._ratelimit_reset: float = 0.0
+
+    @classmethod
+    async def shared(cls, logger: Logger) -> 'TwitchHelix':
+        """Get the shared TwitchHelix client, opening it on first use so that
+        every Helix call made by the services reuses the same HTTP session
+
+        :param logger: A logger object
+        :return: The open TwitchHelix client
+        """
+        if cls._shared is None:
+            config = load_default_config(logger)
+            oauth_token = config['twitch']['oauth_token']
+            client_id = config['twitch']['client_id']
+            logger.debug('twitch_helix.py: Opening shared Helix session')
+            cls._shared = cls(client_id, oauth_token)
+            await cls._shared.open()
+        return cls._shared
+
+    @classmethod
+    async def close_shared(cls) -> None:
+        """Close the shared TwitchHelix client, if it was opened
+        """
+        if cls._shared is not None:
+            twitch, cls._shared = cls._shared, None
+            await twitch.close()
+
+    async def open(self) -> None:
+        """Open an aiohttp.ClientSession with a connection pool suited to
+        making repeated requests to the one Helix host
+        """
+        if not self._session:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=MAX_CONCURRENT_REQUESTS,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=DNS_CACHE_TTL)
+            self._session = aiohttp.ClientSession(connector=connector)
+
+    async def _transaction(self, method: str, path: str, **kwargs) \
+            -> Union[str, dict, list]:
+        """Make the HTTP call as AsyncBaseWebAPI does, but follow the Helix
+        Ratelimit-* response headers. Requests wait for the bucket to refill
+        once Twitch reports it empty, and 429 responses are retried
+
+        :param method: The HTTP method / RESTful verb  to use for this
+            transaction.
+        :param path: The path to the API object you wish to call
+        :param kwargs: The collection of keyword arguments that the aiohttp
+            request method will accept
+        :return: Either the response string or decoded JSON object
+        """
+        kwargs['ssl'] = None if self.enforce_cert else False
+        kwargs['headers'] = self.headers
+        url = self.base_url + path
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            await self._wait_for_rate_limit()
+            async with self._session.request(method, url, **kwargs) as conn:
+                self._update_rate_limit(conn.headers)
+                if conn.status == 429 and attempt < RATE_LIMIT_RETRIES:
+                    if self._ratelimit_remaining is None:
+                        # No bucket info to go on, so back off exponentially
+                        await asyncio.sleep(2 ** attempt)
+                    continue
+                if conn.status not in self.status_codes:
+                    raise aiohttp.ClientResponseError(conn.request_info,
+                                                      (conn,),
+                                                      status=conn.status,
+                                                      message=await conn.text())
+                if conn.content_type == 'application/json':
+                    return await conn.json()
+                return await conn.text()
+
+    async def _wait_for_rate_limit(self) -> None:
+        """Wait for the rate limit bucket to be refilled if it's empty, and
+        count this request against it
+        """
+        if self._ratelimit_remaining is None:
+            return
+        if self._ratelimit_remaining <= 0:
+            delay = self._ratelimit_reset - time.time()
+            if delay > 0:
+                await asyncio.sleep(min(delay, MAX_RATE_LIMIT_WAIT))
+            # Let the next response tell us the refilled bucket size
+            self._ratelimit_remaining = None
+            return
+        self._ratelimit_remaining -= 1
+
+    def _update_rate_limit(self, headers: Mapping) -> None:
+        """Update the rate limit bucket state from the response headers
+
+        :param headers: The HTTP response headers
+        """
+        remaining = headers.get('Ratelimit-Remaining')
+        reset = headers.get('Ratelimit-Reset')
+        if remaining is None or reset is None:
+            return
+        self._ratelimit_remaining = int(remaining)
+        # The reset time is a Unix epoch timestamp
+        self._ratelimit_reset = float(reset)
 
     async def get_emote_set(self, emote_set_id: str) -> List:
         """Get an emote set from the Twitch Helix API
@@ -27,19 +197,56 @@ class TwitchHelix(AsyncBaseWebAPI):
         :param emote_set_id: The ID of the emote set
         :return: A list of Emotes
         """
-        path = '/helix/chat/emotes/set'
-        params = {'emote_set_id': str(emote_set_id)}
-        result = await self._transaction('get', path, params=params)
-        return result.get('data')
+        emotes = self._emote_set_cache.get(emote_set_id)
+        if emotes is not None:
+            return emotes
+        params = {'emote_set_id': emote_set_id}
+        result = await self._transaction('get', self._EMOTE_SET_PATH,
+                                         params=params)
+        emotes = result.get('data')
+        if emotes is not None:
+            self._emote_set_cache.set(emote_set_id, emotes)
+        return emotes
+
+    async def get_emote_sets_batch(self, emote_set_ids: List[str]) \
+            -> List[List]:
+        """Get several emote sets from the Twitch Helix API in one request
+
+        :param emote_set_ids: The IDs of the emote sets, no more than
+            EMOTE_SETS_PER_REQUEST
+        :return: A list of Emotes for each emote set, in the order requested
+        """
+        emote_sets = {x: self._emote_set_cache.get(x) for x in emote_set_ids}
+        missing = [x for x, emotes in emote_sets.items() if emotes is None]
+        if missing:
+            # A list of pairs repeats the parameter in the query string
+            params = [('emote_set_id', x) for x in missing]
+            result = await self._transaction('get', self._EMOTE_SET_PATH,
+                                             params=params)
+            fetched = {x: [] for x in missing}
+            # The emotes from every set come back in one list
+            for emote in result.get('data') or []:
+                emotes = fetched.get(emote.get('emote_set_id'))
+                if emotes is not None:
+                    emotes.append(emote)
+            for emote_set_id, emotes in fetched.items():
+                self._emote_set_cache.set(emote_set_id, emotes)
+            emote_sets.update(fetched)
+        return [emote_sets[x] for x in emote_set_ids]
 
     async def get_global_badges(self) -> List:
         """Get the global chat badges from the Titch Helix API
 
         :return: A list of badges
         """
-        path ='/helix/chat/badges/global'
-        result = await self._transaction('get', path)
-        return result.get('data')
+        badges = self._badge_cache.get('global')
+        if badges is not None:
+            return badges
+        result = await self._transaction('get', self._GLOBAL_BADGES_PATH)
+        badges = result.get('data')
+        if badges is not None:
+            self._badge_cache.set('global', badges)
+        return badges
 
     async def get_channel_badges(self, broadcaster_id: str) -> List:
         """Get the chat badges for a specific channel
@@ -47,10 +254,47 @@ class TwitchHelix(AsyncBaseWebAPI):
         :param broadcaster_id: The ID for the channel
         :return: A list of badges
         """
-        path = '/helix/chat/badges/'
+        badges = self._badge_cache.get(broadcaster_id)
+        if badges is not None:
+            return badges
         params = {'broadcaster_id': broadcaster_id}
-        result = await self._transaction('get', path, params=params)
-        return result.get('data')
+        result = await self._transaction('get', self._CHANNEL_BADGES_PATH,
+                                         params=params)
+        badges = result.get('data')
+        if badges is not None:
+            self._badge_cache.set(broadcaster_id, badges)
+        return badges
+
+
+async def iter_emote_sets(emote_set_ids: List[str], logger: Logger) \
+        -> AsyncIterator[List]:
+    """Get emote sets from the Twitch Helix API, yielding each one as soon as
+    it arrives rather than in the order requested
+
+    :param emote_set_ids: The IDs of the emote sets
+    :param logger: A logger object
+    :return: An async iterator of emote lists
+    """
+    twitch = await TwitchHelix.shared(logger)
+    # Make sure we don't fall foul of rate limiting by capping the number of
+    # requests in flight, rather than waiting on each batch to finish
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+    async def bounded_get(batch: List[str]) -> List[List]:
+        async with semaphore:
+            return await twitch.get_emote_sets_batch(batch)
+
+    tasks = [asyncio.ensure_future(bounded_get(
+        emote_set_ids[x:x + EMOTE_SETS_PER_REQUEST]))
+        for x in range(0, len(emote_set_ids), EMOTE_SETS_PER_REQUEST)]
+    try:
+        for next_batch in asyncio.as_completed(tasks):
+            for emote_set in await next_batch:
+                yield emote_set
+    finally:
+        # Don't leave requests running if the caller stops early
+        for task in tasks:
+            task.cancel()
 
 
 async def get_emote_sets(emote_set_ids: List[str], logger: Logger) -> List:
@@ -60,24 +304,7 @@ async def get_emote_sets(emote_set_ids: List[str], logger: Logger) -> List:
     :param logger: A logger object
     :return: A list of Emotes
     """
-    config = load_default_config(logger)
-    oauth_token = config['twitch']['oauth_token']
-    client_id = config['twitch']['client_id']
-    async with TwitchHelix(client_id, oauth_token) as twitch:
-        emote_sets = []
-        start_mark = 0
-        # Make sure we don't fall foul of rate limiting by doing 10 requests
-        # at a time
-        for end_mark in range(10, len(emote_set_ids), 10):
-            futures = [twitch.get_emote_set(x) for x in
-                       emote_set_ids[start_mark:end_mark]]
-            emote_sets += await asyncio.gather(*futures)
-            start_mark = end_mark
-        # And the last one(s)
-        futures = [twitch.get_emote_set(x) for x in
-                   emote_set_ids[start_mark:]]
-        emote_sets += await asyncio.gather(*futures)
-    return emote_sets
+    return [x async for x in iter_emote_sets(emote_set_ids, logger)]
 
 
 async def get_channel_badges(broadcaster_id: str, logger: Logger) -> List:
@@ -87,10 +314,10 @@ async def get_channel_badges(broadcaster_id: str, logger: Logger) -> List:
     :param logger: A logger object
     :return: A list of Badges
     """
-    config = load_default_config(logger)
-    oauth_token = config['twitch']['oauth_token']
-    client_id = config['twitch']['client_id']
-    async with TwitchHelix(client_id, oauth_token) as twitch:
-        badge_list = await twitch.get_global_badges()
-        badge_list += await twitch.get_channel_badges(broadcaster_id)
-    return badge_list
+    twitch = await TwitchHelix.shared(logger)
+    # The two requests don't depend on each other. Keep the global badges
+    # first so channel badges take precedence when searched in order
+    global_badges, channel_badges = await asyncio.gather(
+        twitch.get_global_badges(),
+        twitch.get_channel_badges(broadcaster_id))
+    return (global_badges or []) + (channel_badges or [])
@@ -1,21 +1,77 @@
 """An example plugin to provide a basic chat commands bot
 """
-from typing import Dict, Union, List
+from typing import Dict, FrozenSet, Union, Tuple
 from logging import Logger
+from concurrent.futures import ThreadPoolExecutor
 import os
 import asyncio
 import sqlite3
 from appdirs import user_data_dir
 from nrrd_twitch_bot import BasePlugin
 
+DB_PATH = os.path.join(user_data_dir('nrrd-twitch-bot', 'djnrrd'),
+                       'chat_commands.db')
+# sqlite3 keeps prepared statements cached per connection keyed on the SQL
+# text, so always use the same strings
+LOAD_SQL = 'SELECT command, response, level FROM chat_commands;'
+# Adding an existing command replaces it rather than failing on the unique
+# index. Upserts need sqlite 3.24, RETURNING would need 3.35 so is not used
+INSERT_SQL = '''INSERT INTO chat_commands VALUES (?, ?, ?)
+                ON CONFLICT(command) DO UPDATE
+                SET level = excluded.level, response = excluded.response;'''
+DELETE_SQL = 'DELETE FROM chat_commands WHERE command = ?;'
+# Replies waiting to go to chat before new ones are dropped
+SEND_QUEUE_SIZE = 256
+
 
 class ChatCommands(BasePlugin):
     """A basic chat command bot
     """
+    # User levels from highest to lowest, a user has their own level and
+    # every level below it
+    LEVELS = ('broadcaster', 'moderator', 'vip', 'subscriber', 'all')
+    # The set of levels for each user's highest level, shared between
+    # messages for hashed membership checks
+    LEVEL_SETS = tuple(frozenset(levels) for levels in
+                       (LEVELS, LEVELS[1:], LEVELS[2:], LEVELS[3:],
+                        LEVELS[4:]))
+    USAGE = f"Usage: !command add|delete command_name {'|'.join(LEVELS)} " \
+            f"{{response}}"
 
     def __init__(self, logger: Logger):
         super().__init__(logger)
+        # A single worker thread does all the database writes, so they
+        # don't block the event loop and never run concurrently
+        self._db_executor = ThreadPoolExecutor(max_workers=1)
+        self._send_queue: asyncio.Queue = asyncio.Queue(SEND_QUEUE_SIZE)
         self.db_conn = self._init_db()
+        # The commands table is small, so keep all of it in memory for
+        # lookups. The database is only touched when commands change
+        self.commands: Dict[str, Tuple[str, str]] = \
+            {command: (response, level) for command, response, level in
+             self.db_conn.execute(LOAD_SQL)}
+
+    async def run(self) -> None:
+        """Pass responses from the send queue to the dispatcher, then finish
+        the database writes and close the database when the services stop
+        """
+        try:
+            while True:
+                response = await self._send_queue.get()
+                await self.dispatcher.chat_send(response)
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        """Wait for any queued database writes, then close the database
+        """
+        self.logger.debug('chat_commands: Closing sqlite3 dB')
+        # The single worker runs jobs in order, so once this no-op has run
+        # every earlier write has too. Awaiting it leaves the event loop free
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._db_executor, lambda: None)
+        self._db_executor.shutdown(wait=False)
+        self.db_conn.close()
 
     async def do_privmsg(self, message: Dict) -> None:
         """Log the message dictionary from the dispatcher to the logger object
@@ -24,41 +80,51 @@ class ChatCommands(BasePlugin):
             Key/Value pairs, plus the 'nickname' key, and the 'msg_text' key
         """
         # Make sure this is a command before any further processing
-        if message['msg_text'][0] != '!':
+        text = message['msg_text']
+        if not text.startswith('!'):
             return
-        user_levels = ['broadcaster', 'moderator', 'vip', 'subscriber', 'all']
-        if 'broadcaster' in message['badges']:
-            pass
+        badges = message['badges']
+        if 'broadcaster' in badges:
+            highest = 0
         elif message['mod'] == '1':
-            user_levels = user_levels[1:]
-        elif 'vip' in message['badges']:
-            user_levels = user_levels[2:]
+            highest = 1
+        elif 'vip' in badges:
+            highest = 2
         elif message['subscriber'] == '1':
-            user_levels = user_levels[3:]
+            highest = 3
         else:
-            user_levels = user_levels[4:]
-        parts = message['msg_text'].split(' ')
-        command = parts[0][1:]
-        args = parts[1:]
-        self.logger.debug(f"chat_commands: command {command} received with "
-                          f"args {args}")
+            highest = 4
+        user_levels = self.LEVEL_SETS[highest]
+        # Only the command name is needed to find a response, the arguments
+        # are split up later if something actually uses them
+        command, _, rest = text[1:].partition(' ')
+        self.logger.debug('chat_commands: command %s received with args %s',
+                          command, rest)
         if command == 'command':
-            response = self.manage_commands(user_levels, *args)
+            response = await self.manage_commands(user_levels,
+                                                  *rest.split(' '))
         else:
-            response = self.lookup_commands(command, user_levels, *args)
+            response = self.lookup_commands(command, user_levels, rest)
         if response:
-            self.logger.debug(f"chat_commands: response is {response}")
-            asyncio.create_task(self.dispatcher.chat_send(response))
+            self.logger.debug('chat_commands: response is %s', response)
+            try:
+                self._send_queue.put_nowait(response)
+            except asyncio.QueueFull:
+                self.logger.warning('chat_commands: Send queue full, '
+                                    'dropping response')
 
     def _init_db(self) -> sqlite3.Connection:
         """Load and initialise the chat_commands sqlite3 Database
 
         :return: The Database connection
         """
-        db_dir = user_data_dir('nrrd-twitch-bot', 'djnrrd')
-        db_path = os.path.join(db_dir, 'chat_commands.db')
-        self.logger.debug(f"chat_commands: Loading sqlite3 dB from {db_path}")
-        load_db = sqlite3.connect(db_path)
+        self.logger.debug('chat_commands: Loading sqlite3 dB from %s', DB_PATH)
+        # Writes happen on the executor thread rather than this one
+        load_db = sqlite3.connect(DB_PATH, check_same_thread=False)
+        # Write ahead logging avoids a full sync on every command change
+        load_db.execute('PRAGMA journal_mode=WAL;')
+        load_db.execute('PRAGMA synchronous=NORMAL;')
+        load_db.execute('PRAGMA temp_store=MEMORY;')
         with load_db:
             init_table = '''CREATE TABLE IF NOT EXISTS chat_commands (
                                 command TEXT NOT NULL,
@@ -71,37 +137,46 @@ class ChatCommands(BasePlugin):
             load_db.execute(init_index)
         return load_db
 
-    def lookup_commands(self, command: str, user_levels: List, *args) \
-            -> Union[str, None]:
+    def lookup_commands(self, command: str, user_levels: FrozenSet,
+                        rest: str) -> Union[str, None]:
         """Return the response to the chat commands
 
         :param command: The extracted command
         :param user_levels: The user's user levels
-        :param args: The list of arguments
+        :param rest: The rest of the message after the command
         :return: The command response if found
         """
-        with self.db_conn as con:
-            response = con.execute('SELECT response, level FROM chat_commands '
-                                   'WHERE command = ?', (command, ))
-            result = response.fetchall()
-            if len(result) == 1:
-                level = result[0][1]
-                if level not in user_levels:
-                    return
-                self.logger.debug(f"chat_commands: Found entry for {command} "
-                                  f"in sqlite3 dB")
-                return result[0][0].format(*args)
-
-    def manage_commands(self, user_levels: List, *args) -> Union[str, None]:
+        result = self.commands.get(command)
+        if result:
+            response, level = result
+            if level not in user_levels:
+                return
+            self.logger.debug('chat_commands: Found entry for %s', command)
+            if rest:
+                return response.format(*rest.split(' '))
+            return response.format()
+
+    async def _write_db(self, sql: str, params: Tuple) -> None:
+        """Run a write statement in its own transaction on the database
+        executor thread
+
+        :param sql: The SQL statement
+        :param params: The parameters for the statement
+        """
+        def write() -> None:
+            with self.db_conn as con:
+                con.execute(sql, params)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._db_executor, write)
+
+    async def manage_commands(self, user_levels: FrozenSet, *args) \
+            -> Union[str, None]:
         """Add or delete commands to the database
 
         :param user_levels: The user's user levels
         :param args: The list of arguments to the 'command' command
         :return: The command response
         """
-        all_levels = ['broadcaster', 'moderator', 'vip', 'subscriber', 'all']
-        usage = 'Usage: !command add|delete command_name ' \
-                'broadcaster|moderator|vip|subscriber|all {response}'
         if 'moderator' not in user_levels:
             return 'Mod use only'
         if len(args) >= 2:
@@ -109,18 +184,16 @@ class ChatCommands(BasePlugin):
                 if len(args) >= 4:
                     command = args[1]
                     level = args[2]
-                    if level not in all_levels:
-                        return usage
+                    if level not in self.LEVEL_SETS[0]:
+                        return self.USAGE
                     response = ' '.join(args[3:])
-                    with self.db_conn as con:
-                        con.execute('INSERT INTO chat_commands '
-                                    'VALUES (?, ?, ?);',
-                                    (command, level, response))
+                    await self._write_db(INSERT_SQL,
+                                         (command, level, response))
+                    self.commands[command] = (response, level)
                     return f"Added command {command}"
             elif args[0] == 'delete':
                 command = args[1]
-                with self.db_conn as con:
-                    con.execute('DELETE FROM chat_commands WHERE command = ?;',
-                                (command, ))
+                await self._write_db(DELETE_SQL, (command, ))
+                self.commands.pop(command, None)
                 return f"Deleted command {command}"
-        return usage
+        return self.USAGE
@@ -1,18 +1,41 @@
 """An example plugin to provide an OBS chat overlay
 """
-from typing import Dict, Union, List
+from typing import Callable, Dict, Union, List
+import asyncio
 import os
+import time
+import re
+import hashlib
+from functools import lru_cache
+from operator import itemgetter
 from html import escape
+from aiohttp import ClientError
 from aiohttp.web import Request, Response, FileResponse, StreamResponse, \
     WebSocketResponse
 from jinja2 import Environment, FileSystemLoader
 from nrrd_twitch_bot import BasePlugin, load_config, get_channel_badges
 from .bttv import AsyncBttv
 
+INDEX_PATH = os.path.join(os.path.dirname(__file__), 'static', 'index.html')
+HTML_CONTENT_TYPE = 'text/html; charset=utf-8'
+JSCRIPT_CONTENT_TYPE = 'application/ecmascript; charset=utf-8'
+CSS_CONTENT_TYPE = 'text/css; charset=utf-8'
+# Let the browser keep its copy of a file, but check with an If-None-Match
+# request each time in case the overlay options were changed
+CACHE_CONTROL = 'no-cache'
+# How long to use the BTTV emotes for before refreshing them in the
+# background, in seconds
+BTTV_CACHE_TTL = 300
+# The emotes tag is emote_id:start-end,start-end/emote_id:start-end
+EMOTE_RE = re.compile(r'([^/:]+):([^/]+)')
+PLACEMENT_RE = re.compile(r'(\d+)-(\d+)')
+
 
 class ChatOverlay(BasePlugin):
     """An OBS Overlay for twitch chat
     """
+    # Chat bursts are sent to the overlay as JSON arrays of messages
+    ws_batch_size = 32
 
     def __init__(self, logger):
         super().__init__(logger)
@@ -20,9 +43,50 @@ class ChatOverlay(BasePlugin):
         loader = FileSystemLoader(load_path)
         self.jinja_env = Environment(loader=loader)
         self.config = load_config('chat_overlay.ini')
+        # The config doesn't change while the plugin is running, so the
+        # templates only need rendering once
+        config = dict(self.config.items('DEFAULT'))
+        self.badges_option = self.config['DEFAULT'].getboolean(
+            'badges_option', False)
+        self.bttv_option = self.config['DEFAULT'].getboolean('bttv_option',
+                                                             False)
+        with open(INDEX_PATH, 'rb') as index_file:
+            self.index_page = index_file.read()
+        self.index_etag = _etag(self.index_page)
+        self.jscript_file = self.jinja_env.get_template('overlay.js').render(
+            config=config).encode('utf-8')
+        self.jscript_etag = _etag(self.jscript_file)
+        self.style_sheet = self.jinja_env.get_template('style.css').render(
+            config=config).encode('utf-8')
+        self.style_sheet_etag = _etag(self.style_sheet)
+        self._routes: Dict[str, Callable[[Request], StreamResponse]] = {
+            '': self._send_index,
+            '/': self._send_index,
+            'index.html': self._send_index,
+            'overlay.js': self._send_jscript,
+            'style.css': self._send_style_sheet
+        }
         self.bttv_cache = {}
+        self.bttv_html: Dict[str, str] = {}
+        self._bttv_channel_id: Union[str, None] = None
+        self._bttv_cache_time = 0.0
+        self._bttv_refresh: Union[asyncio.Task, None] = None
+        self._bttv: Union[AsyncBttv, None] = None
         self.badges_cache = []
 
+    async def run(self) -> None:
+        """Keep one BTTV API session open for the emote cache refreshes while
+        the services are running
+        """
+        if not self.bttv_option:
+            return
+        async with AsyncBttv() as bttv:
+            self._bttv = bttv
+            try:
+                await asyncio.Event().wait()
+            finally:
+                self._bttv = None
+
     async def do_privmsg(self, message: Dict) -> None:
         """Get emotes and pronouns before forwarding the chat message to the
         OBS overlay via the websocket queue
@@ -32,15 +96,19 @@ class ChatOverlay(BasePlugin):
         """
         message['msg_type'] = 'privmsg'
         message = emote_replacement(message)
-        if self.config['DEFAULT'].get('badges_option'):
+        if self.badges_option:
             if not self.badges_cache:
                 await self._update_badges_cache()
             message = badge_replacement(message, self.badges_cache)
-        if self.config['DEFAULT'].get('bttv_option'):
-            if not self.bttv_cache:
-                await self._update_bttv_cache(message.get('room-id'))
-            message = bttv_replacement(message, self.bttv_cache)
-        self.logger.debug(f"chat_overlay.plugin.py:  {message}")
+        if self.bttv_option:
+            channel_id = message.get('room-id')
+            refresh = self._check_bttv_cache(channel_id)
+            # Carry on with the emotes we have while they're refreshed,
+            # unless there are none yet for this channel
+            if refresh and self._bttv_channel_id != channel_id:
+                await refresh
+            message = bttv_replacement(message, self.bttv_html)
+        self.logger.debug('chat_overlay.plugin.py: %s', message)
         await self.send_web_socket(message)
 
     async def do_clearchat(self, message: Dict) -> None:
@@ -51,7 +119,7 @@ class ChatOverlay(BasePlugin):
             Key/Value pairs, plus the 'nickname' key, and the 'msg_text' key
         """
         message['msg_type'] = 'clearchat'
-        self.logger.debug(f"chat_overlay.plugin.py: {message}")
+        self.logger.debug('chat_overlay.plugin.py: %s', message)
         await self.send_web_socket(message)
 
     async def do_clearmsg(self, message: Dict) -> None:
@@ -62,7 +130,7 @@ class ChatOverlay(BasePlugin):
             Key/Value pairs, plus the 'nickname' key, and the 'msg_text' key
         """
         message['msg_type'] = 'clearmsg'
-        self.logger.debug(f"chat_overlay.plugin.py: {message}")
+        self.logger.debug('chat_overlay.plugin.py: %s', message)
         await self.send_web_socket(message)
 
     async def http_handler(self, request: Request) \
@@ -72,29 +140,45 @@ class ChatOverlay(BasePlugin):
         :param request: An aiohttp Request object
         :return: The file to serve through HTTP
         """
-        base_path = os.path.join(os.path.dirname(__file__), 'static')
-        config = dict(self.config.items('DEFAULT'))
-        if request.match_info['path'] == '' \
-                or request.match_info['path'] == '/' \
-                or request.match_info['path'] == 'index.html':
-            self.logger.debug('chat_overlay.plugin.py: sending index page')
-            return FileResponse(path=os.path.join(base_path, 'index.html'))
-        if request.match_info['path'] == 'overlay.js':
-            header = {'Content-type': 'application/ecmascript'}
-            self.logger.debug('chat_overlay.plugin.py: sending Javascript')
-            jscript_template = self.jinja_env.get_template('overlay.js')
-            jscript_file = jscript_template.render(config=config)
-            return Response(text=jscript_file, headers=header)
-        if request.match_info['path'] == 'style.css':
-            header = {'Content-type': 'text/css'}
-            self.logger.debug('chat_overlay.plugin.py: sending stylesheet')
-            if config.get('custom_css') == 'True':
-                css_file = config.get('custom_css_path')
-                return FileResponse(path=css_file)
-            else:
-                css_template = self.jinja_env.get_template('style.css')
-                style_sheet = css_template.render(config=config)
-                return Response(text=style_sheet, headers=header)
+        handler = self._routes.get(request.match_info['path'])
+        if handler is None:
+            return Response(status=404)
+        return handler(request)
+
+    def _send_index(self, request: Request) -> Response:
+        """Serve the overlay index page
+
+        :param request: An aiohttp Request object
+        :return: The index page
+        """
+        self.logger.debug('chat_overlay.plugin.py: sending index page')
+        return _cached_response(request, self.index_page, self.index_etag,
+                                HTML_CONTENT_TYPE)
+
+    def _send_jscript(self, request: Request) -> Response:
+        """Serve the rendered overlay Javascript
+
+        :param request: An aiohttp Request object
+        :return: The Javascript
+        """
+        self.logger.debug('chat_overlay.plugin.py: sending Javascript')
+        return _cached_response(request, self.jscript_file, self.jscript_etag,
+                                JSCRIPT_CONTENT_TYPE)
+
+    def _send_style_sheet(self, request: Request) \
+            -> Union[Response, FileResponse]:
+        """Serve the rendered style sheet, or the user's custom style sheet
+
+        :param request: An aiohttp Request object
+        :return: The style sheet
+        """
+        self.logger.debug('chat_overlay.plugin.py: sending stylesheet')
+        if self.config['DEFAULT'].get('custom_css') == 'True':
+            css_file = self.config['DEFAULT'].get('custom_css_path')
+            return FileResponse(path=css_file,
+                                headers={'Cache-Control': CACHE_CONTROL})
+        return _cached_response(request, self.style_sheet,
+                                self.style_sheet_etag, CSS_CONTENT_TYPE)
 
     async def websocket_handler(self, request: Request) -> WebSocketResponse:
         """Create a websocket instance for the plugin
@@ -104,13 +188,49 @@ class ChatOverlay(BasePlugin):
         """
         return await self._websocket_handler(request)
 
+    def _check_bttv_cache(self, channel_id: str) \
+            -> Union[asyncio.Task, None]:
+        """Start refreshing the BTTV emotes in the background if they are out
+        of date or for a different channel
+
+        :param channel_id: The channel ID as determined from a privmsg tag
+        :return: The refresh task, if one is running
+        """
+        if self._bttv_refresh is None or self._bttv_refresh.done():
+            self._bttv_refresh = None
+            if channel_id != self._bttv_channel_id or \
+                    time.monotonic() - self._bttv_cache_time > BTTV_CACHE_TTL:
+                self._bttv_refresh = asyncio.create_task(
+                    self._update_bttv_cache(channel_id))
+        return self._bttv_refresh
+
     async def _update_bttv_cache(self, channel_id: str) -> None:
         """Get the BTTV Emotes for the channel
 
         :param channel_id: The channel ID as determined from a privmsg tag
         """
-        async with AsyncBttv() as bttv:
-            self.bttv_cache = await bttv.get_channel_emotes(channel_id)
+        try:
+            if self._bttv is not None:
+                bttv_cache = await self._bttv.get_channel_emotes(channel_id)
+            else:
+                async with AsyncBttv() as bttv:
+                    bttv_cache = await bttv.get_channel_emotes(channel_id)
+            bttv_html = bttv_emote_html(bttv_cache)
+        except (ClientError, asyncio.TimeoutError, KeyError,
+                ValueError) as err:
+            # Network failures, bad JSON or emotes missing their fields
+            self.logger.warning('chat_overlay.plugin.py: Could not get BTTV '
+                                'emotes: %r', err)
+            if channel_id != self._bttv_channel_id:
+                self.bttv_cache = {}
+                self.bttv_html = {}
+        else:
+            self.bttv_cache = bttv_cache
+            self.bttv_html = bttv_html
+        finally:
+            # Don't retry on every message if BTTV couldn't be reached
+            self._bttv_channel_id = channel_id
+            self._bttv_cache_time = time.monotonic()
 
     async def _update_badges_cache(self) -> None:
         """Get the channel badges from the Twitch Helix API
@@ -122,6 +242,58 @@ class ChatOverlay(BasePlugin):
                                                      self.logger)
 
 
+def _etag(body: bytes) -> str:
+    """Create an HTTP entity tag for a response body
+
+    :param body: The response body
+    :return: The quoted entity tag
+    """
+    return f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+def _cached_response(request: Request, body: bytes, etag: str,
+                     content_type: str) -> Response:
+    """Serve a pre-encoded response body, or a 304 Not Modified if the
+    browser already has the same copy
+
+    :param request: An aiohttp Request object
+    :param body: The encoded response body
+    :param etag: The entity tag for the body
+    :param content_type: The Content-Type header value
+    :return: The HTTP response
+    """
+    headers = {'ETag': etag, 'Cache-Control': CACHE_CONTROL}
+    if request.headers.get('If-None-Match') == etag:
+        return Response(status=304, headers=headers)
+    headers['Content-Type'] = content_type
+    return Response(body=body, headers=headers)
+
+
+def escape_html(text: str) -> str:
+    """Escape HTML characters in chat text, skipping the escape altogether
+    for the usual text which has none
+
+    :param text: The chat text
+    :return: The escaped text
+    """
+    if '&' in text or '<' in text or '>' in text or '"' in text \
+            or "'" in text:
+        return escape(text, quote=True)
+    return text
+
+
+@lru_cache(maxsize=4096)
+def emote_img(emote_uuid: str) -> str:
+    """Create the img tag for a Twitch emote. The same emotes turn up in chat
+    over and over, so the tags are cached
+
+    :param emote_uuid: The emote ID
+    :return: The IMG tag to the emote on Twitch's CDN
+    """
+    return f"<img src='https://static-cdn.jtvnw.net/emoticons/v2/" \
+           f"{emote_uuid}/default/light/1.0' />"
+
+
 def emote_replacement(message: Dict) -> Dict:
     """Escape HTML characters in the text and identify emotes in a message
     replacing them with img tags to the emotes on Twitch's CDN
@@ -132,56 +304,72 @@ def emote_replacement(message: Dict) -> Dict:
     # Identify emotes and placements, multiple emotes are split by '/',
     # emote uuid and placements is separated by ':'. Multiple placements
     # are split by ',' and the start and end placements are split by '-'
-    if message.get('emotes'):
+    emotes = message.get('emotes')
+    if emotes:
         emote_list = []
-        for emote in message.get('emotes').split('/'):
-            emote_uuid = emote.split(':')[0]
-            placements = emote.split(':')[1]
-            for placement in placements.split(','):
-                start_mark = placement.split('-')[0]
-                end_mark = placement.split('-')[1]
-                start_mark = int(start_mark)
+        for emote in EMOTE_RE.finditer(emotes):
+            emote_uuid = emote.group(1)
+            for placement in PLACEMENT_RE.finditer(emote.group(2)):
                 # Add 1 to the end marker to make python slices work
-                end_mark = int(end_mark) + 1
-                emote_list.append((start_mark, end_mark, emote_uuid))
+                emote_list.append((int(placement.group(1)),
+                                   int(placement.group(2)) + 1, emote_uuid))
         # Start working through the message, escaping HTML inbetween the
         # emotes
+        msg_text = message['msg_text']
         end_section = 0
         msg_parts = []
-        for emote in sorted(emote_list, key=lambda x: x[0]):
-            pre_text = escape(message['msg_text'][end_section:emote[0]],
-                              quote=True)
-            emote_html = f"<img src='https://static-cdn.jtvnw.net/" \
-                         f"emoticons/v2/{emote[2]}/default/light/1.0' />"
-            msg_parts += [pre_text, emote_html]
+        append = msg_parts.append
+        # Placements are in order for each emote, so the list is a few
+        # ascending runs which an in place sort merges in linear time. A
+        # single emote needs no sorting at all
+        if len(emote_list) > 1:
+            emote_list.sort(key=itemgetter(0))
+        for emote in emote_list:
+            append(escape_html(msg_text[end_section:emote[0]]))
+            append(emote_img(emote[2]))
             end_section = emote[1]
-        post_text = escape(message['msg_text'][end_section:], quote=True)
-        msg_parts.append(post_text)
+        append(escape_html(msg_text[end_section:]))
         message['msg_text'] = ''.join(msg_parts)
     else:
         # Escape HTML characters in the whole message instead
-        message['msg_text'] = escape(message['msg_text'], quote=True)
+        message['msg_text'] = escape_html(message['msg_text'])
     return message
 
 
-def bttv_replacement(message: Dict, bttv_emotes: Dict) -> Dict:
+def bttv_emote_html(bttv_emotes: Dict) -> Dict[str, str]:
+    """Map the BTTV emote codes for a channel to img tags to the emotes on
+    BTTV's CDN
+
+    :param bttv_emotes: The cache of BTTV emotes for the channel.
+    :return: The dictionary of emote codes and IMG tags
+    """
+    emotes = bttv_emotes.get('channelEmotes', []) + \
+        bttv_emotes.get('sharedEmotes', [])
+    # Codes are matched against the message text after its HTML has been
+    # escaped, so escape them the same way
+    return {escape(x['code'], quote=True):
+            f"<img src='https://cdn.betterttv.net/emote/{x['id']}/1x' />"
+            for x in emotes}
+
+
+def bttv_replacement(message: Dict, bttv_html: Dict[str, str]) -> Dict:
     """Identify BTTV emotes in a message replacing them with img tags to the
     emotes on BTTV's CDN
 
     :param message: The message from the Dispatcher
-    :param bttv_emotes: The cache of BTTV emotes for the channel.
+    :param bttv_html: The BTTV emote codes for the channel and their IMG
+        tags, from bttv_emote_html()
     :return: The message updated with the IMG tags
     """
-    emote_set = [(x['code'], x['id']) for x in bttv_emotes['channelEmotes']]
-    emote_set += [(x['code'], x['id']) for x in bttv_emotes['sharedEmotes']]
-    # Make sure that we use the longest emote codes first in case the shorter
-    # ones clash
-    msg_text = message['msg_text']
-    for emote in sorted(emote_set, key=lambda x: len(x[0]), reverse=True):
-        msg_text = msg_text.replace(emote[0],
-                                    f"<img src='https://cdn.betterttv.net/"
-                                    f"emote/{emote[1]}/1x' />")
-    message['msg_text'] = msg_text
+    if bttv_html:
+        # BTTV emotes are whole words, so a single pass looking up each word
+        # replaces them all, and never inside a longer word
+        words = message['msg_text'].split(' ')
+        # Most messages have no BTTV emotes, so check that in one go before
+        # rebuilding the text
+        if not bttv_html.keys().isdisjoint(words):
+            message['msg_text'] = ' '.join([bttv_html.get(x, x)
+                                            for x in words])
     return message
 
 
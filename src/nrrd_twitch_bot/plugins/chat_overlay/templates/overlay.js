@@ -1,7 +1,16 @@
 {% if config.pronoun_option == 'True' %}
 // Create Pronoun lookup objects
 const pronouns_lookup = {};
-const user_pronouns = {};
+// Cached user pronouns, least recently used first
+const user_pronouns = new Map();
+// The request building pronouns_lookup, while one is in progress or done
+let pronouns_lookup_request = null;
+// How long to cache a user's pronouns for, 5 minutes
+const PRONOUN_CACHE_TIME = 5 * 60 * 1000;
+// Most chatters never set pronouns, so check them again less often, 6 hours
+const NO_PRONOUN_CACHE_TIME = 6 * 60 * 60 * 1000;
+// How many users to keep pronouns for
+const PRONOUN_CACHE_SIZE = 4096;
 
 function get(endpoint) {
     // Call the alejo.io pronouns API and return the result
@@ -23,9 +32,16 @@ async function build_pronoun_lookup() {
 
 
 async function lookup_user_pronouns(user_login) {
-    // Make sure we've got the lookup of pronoun keys
+    // Make sure we've got the lookup of pronoun keys, sharing one request
+    // between all the messages waiting on it
+    if (pronouns_lookup_request === null) {
+        pronouns_lookup_request = build_pronoun_lookup();
+    }
+    await pronouns_lookup_request;
     if (Object.keys(pronouns_lookup).length === 0) {
-        await build_pronoun_lookup();
+        // Try again next time
+        pronouns_lookup_request = null;
+        throw new Error('Could not get the pronouns lookup');
     }
     // Get the user's pronouns from the service
     let data = await get(`users/${user_login}`);
@@ -47,59 +63,52 @@ async function lookup_user_pronouns(user_login) {
 }
 
 
-async function add_user_pronoun_cache(chat_msg) {
-    // Get the users pronouns from the alejo service and update the user cache
-    let user_login = chat_msg.nickname;
-    let pronouns = await lookup_user_pronouns(user_login)
-    user_pronouns[user_login] = {'cache_time': Date.now(),
-                                 'pronouns': pronouns}
-    console.log(`Caching ${user_login} pronouns - ${pronouns}`)
-}
-
-
-async function update_user_pronoun_cache(chat_msg) {
-    // Update the user cache with fresh data from the alejo service
-    let user_login = chat_msg.nickname;
-    let pronouns = await lookup_user_pronouns(user_login)
-    user_pronouns[user_login]['pronouns'] = pronouns;
-    user_pronouns[user_login]['cache_time'] = Date.now();
-    console.log(`Refreshed cache for ${user_login}`)
-}
-
-
-function check_cache_time(user_login) {
-    // Check if the user cache is within 5 minutes of the last user lookup
-    if ( Date.now() <= user_pronouns[user_login]['cache_time'] + 500000 ) {
-        return true;
-    } else {
-        return false;
-    };
-}
-
-
-function write_pronouns(chat_msg) {
-    // Write the pronouns from the user cache to the chat message
-    let user_login = chat_msg.nickname;
-    let pronoun_text = user_pronouns[user_login]['pronouns'];
-    let msg_block = document.getElementById(chat_msg.id);
-    let pronoun_block = msg_block.getElementsByClassName('pronoun_tag')[0];
-    pronoun_block.innerHTML = pronoun_text;
+function get_user_pronouns(user_login) {
+    // Get a promise of the user's pronouns, looking them up at most once per
+    // cache period. The promise is cached rather than the result, so a
+    // burst of messages from a new user only makes one request
+    let entry = user_pronouns.get(user_login);
+    if (entry !== undefined) {
+        // Move the user to the most recently used end
+        user_pronouns.delete(user_login);
+        if (Date.now() > entry['expires']) {
+            entry = undefined;
+        }
+    }
+    if (entry === undefined) {
+        entry = {'expires': Infinity};
+        entry['pronouns'] = lookup_user_pronouns(user_login).then(
+            pronouns => {
+                let cache_time = pronouns ? PRONOUN_CACHE_TIME
+                                          : NO_PRONOUN_CACHE_TIME;
+                entry['expires'] = Date.now() + cache_time;
+                return pronouns;
+            },
+            () => {
+                // Don't hold on to a failed lookup for long
+                entry['expires'] = Date.now() + PRONOUN_CACHE_TIME;
+                return '';
+            });
+        console.log(`Caching ${user_login} pronouns`)
+    }
+    user_pronouns.set(user_login, entry);
+    if (user_pronouns.size > PRONOUN_CACHE_SIZE) {
+        user_pronouns.delete(user_pronouns.keys().next().value);
+    }
+    return entry['pronouns'];
 }
 
 
 async function add_pronouns(chat_msg) {
     // Add user pronouns if they exist to the chat message
-    if (chat_msg.nickname in user_pronouns) {
-        if (check_cache_time(chat_msg.nickname)) {
-            write_pronouns(chat_msg);
-        } else {
-            await update_user_pronoun_cache(chat_msg);
-            write_pronouns(chat_msg)
-        }
-    } else {
-        await add_user_pronoun_cache(chat_msg);
-        write_pronouns(chat_msg)
+    let pronoun_text = await get_user_pronouns(chat_msg.nickname);
+    let msg_block = document.getElementById(chat_msg.id);
+    if (msg_block === null) {
+        // The message was removed while we waited
+        return;
     }
+    let pronoun_block = msg_block.getElementsByClassName('pronoun_tag')[0];
+    pronoun_block.innerHTML = pronoun_text;
 }
 
 {% endif %}
@@ -211,7 +220,18 @@ async function timeout_message(chat_msg, timeout_period) {
 function msg_handler(msg) {
     // Main message handler function called from the Websockets client
     console.log(`[message] Data received from server: ${msg.data}`);
-    const chat_msg = JSON.parse(msg.data);
+    const data = JSON.parse(msg.data);
+    // Bursts of chat messages arrive together as an array
+    if (Array.isArray(data)) {
+        data.forEach(handle_chat_msg);
+    } else {
+        handle_chat_msg(data);
+    }
+}
+
+
+function handle_chat_msg(chat_msg) {
+    // Handle a single chat message
     switch(chat_msg.msg_type) {
         case "privmsg":
             // Most messages are privmsg
@@ -1,11 +1,30 @@
 """An example tk config object for the OBS chat overlay plugin
 """
+from typing import List, Tuple, Union
 from logging import Logger
 import tkinter as tk
 from tkinter import ttk, font, filedialog
 from tkinter.colorchooser import askcolor
 from nrrd_twitch_bot import load_config, save_config
 
+GRID_PADDING = {'pady': 5, 'padx': 5}
+CSS_FILETYPES = (('CSS files', '*.css'), ('All files', '*.*'))
+_font_families: Union[Tuple[str, ...], None] = None
+
+
+def get_font_families() -> Tuple[str, ...]:
+    """Get the installed font families, sorted without regard to case. Asking
+    Tk for them is slow, so they are only looked up the first time
+
+    :return: The font family names
+    """
+    global _font_families
+    if _font_families is None:
+        # Tk can list the same family more than once
+        _font_families = tuple(sorted(set(font.families()),
+                                      key=str.casefold))
+    return _font_families
+
 
 class PluginOptions(ttk.Frame):
     """A holding Frame for further Options Sections
@@ -41,6 +60,11 @@ class PluginOptions(ttk.Frame):
         self.pronoun_colour = tk.StringVar()
         self.custom_css = tk.BooleanVar()
         self.custom_css_path = tk.StringVar()
+        self._config = load_config('chat_overlay.ini')
+        # Widgets toggled by the pronoun and custom CSS options, set up by
+        # _build_form
+        self._pronoun_widgets: List[tk.Widget] = []
+        self._css_widgets: List[tk.Widget] = []
         self._setup_app()
         self._build_form()
         self._load_config_values()
@@ -50,24 +74,12 @@ class PluginOptions(ttk.Frame):
     def _setup_app(self) -> None:
         """Setup the grid
         """
-        self.scrollable_frame.grid_rowconfigure(0, weight=1)
-        self.scrollable_frame.grid_rowconfigure(1, weight=0)
-        self.scrollable_frame.grid_rowconfigure(2, weight=0)
-        self.scrollable_frame.grid_rowconfigure(3, weight=0)
-        self.scrollable_frame.grid_rowconfigure(4, weight=0)
-        self.scrollable_frame.grid_rowconfigure(5, weight=0)
-        self.scrollable_frame.grid_rowconfigure(6, weight=0)
-        self.scrollable_frame.grid_rowconfigure(7, weight=0)
-        self.scrollable_frame.grid_rowconfigure(8, weight=0)
-        self.scrollable_frame.grid_rowconfigure(9, weight=0)
-        self.scrollable_frame.grid_rowconfigure(10, weight=0)
-        self.scrollable_frame.grid_rowconfigure(11, weight=0)
-        self.scrollable_frame.grid_rowconfigure(12, weight=0)
-        self.scrollable_frame.grid_rowconfigure(13, weight=0)
-        self.scrollable_frame.grid_rowconfigure(14, weight=1)
-        self.scrollable_frame.grid_columnconfigure(0, weight=0)
+        # Tk takes a list of rows or columns, so each weight is one call. The
+        # header and save button rows take up any spare space
+        self.scrollable_frame.grid_rowconfigure((0, 14), weight=1)
+        self.scrollable_frame.grid_rowconfigure(tuple(range(1, 14)), weight=0)
+        self.scrollable_frame.grid_columnconfigure((0, 2), weight=0)
         self.scrollable_frame.grid_columnconfigure(1, weight=1)
-        self.scrollable_frame.grid_columnconfigure(2, weight=0)
 
     def _build_form(self) -> None:
         """Build all the form elements
@@ -83,8 +95,7 @@ class PluginOptions(ttk.Frame):
         style_chooser = ttk.Combobox(self.scrollable_frame, values=style_list,
                                      textvariable=self.chat_style)
         # Default Font
-        font_list = list(font.families())
-        font_list.sort()
+        font_list = get_font_families()
         font_label = tk.Label(self.scrollable_frame, text='Overlay Font',
                               wraplength=250)
         font_chooser = ttk.Combobox(self.scrollable_frame, values=font_list,
@@ -165,90 +176,99 @@ class PluginOptions(ttk.Frame):
                                          textvariable=self.custom_css_path,
                                          name='css_chosen_file_lbl',
                                          wraplength=250)
+        self._pronoun_widgets = [pronoun_font_label, pronoun_font,
+                                 pronoun_colour_label, pronoun_colour,
+                                 pronoun_colour_picker]
+        self._css_widgets = [css_file_label, css_file_picker,
+                             css_chosen_file_label]
         # Save Button
         save_config_btn = tk.Button(self.scrollable_frame, text='Save',
                                     command=self._save_config_values,
                                     name='save_config', state='normal')
         # Grid layouts
         header_label.grid(row=0, columnspan=3, sticky='new', pady=5)
-        style_label.grid(row=1, column=0, sticky='se', pady=5, padx=5)
-        style_chooser.grid(row=1, column=1, columnspan=2, sticky='sw', pady=5,
-                           padx=5)
-        font_label.grid(row=2, column=0, sticky='se', pady=5, padx=5)
-        font_chooser.grid(row=2, column=1, columnspan=2, sticky='sw', pady=5,
-                          padx=5)
-        size_label.grid(row=3, column=0, sticky='e', pady=5, padx=5)
-        size_chooser.grid(row=3, column=1, columnspan=2, sticky='w', pady=5,
-                          padx=5)
-        colour_label.grid(row=4, column=0, sticky='e', pady=5, padx=5)
-        colour_box.grid(row=4, column=1, sticky='w', pady=5, padx=5)
-        colour_picker.grid(row=4, column=2, sticky='w', pady=5, padx=5)
-        badges_label.grid(row=5, column=0, sticky='e', pady=5, padx=5)
-        badges_option.grid(row=5, column=1, columnspan=2, sticky='w', pady=5,
-                           padx=5)
-        timeout_label.grid(row=6, column=0, sticky='e', pady=5, padx=5)
-        timeout_option.grid(row=6, column=1, columnspan=2, sticky='w', pady=5,
-                            padx=5)
-        bttv_label.grid(row=7, column=0, sticky='e', pady=5, padx=5)
-        bttv_option.grid(row=7, column=1, columnspan=2, sticky='w', pady=5,
-                         padx=5)
-        pronoun_label.grid(row=8, column=0, sticky='e', pady=5, padx=5)
-        pronoun_option.grid(row=8, column=1, columnspan=2, sticky='w', pady=5,
-                            padx=5)
-        pronoun_font_label.grid(row=9, column=0, sticky='e', pady=5, padx=5)
-        pronoun_font.grid(row=9, column=1, sticky='w', pady=5, padx=5)
-        pronoun_colour_label.grid(row=10, column=0, sticky='e', pady=5, padx=5)
-        pronoun_colour.grid(row=10, column=1, sticky='w',pady=5, padx=5)
-        pronoun_colour_picker.grid(row=10, column=2, sticky='w', pady=5, padx=5)
-        custom_css_label.grid(row=11, column=0, sticky='e', pady=5, padx=5)
+        style_label.grid(row=1, column=0, sticky='se', **GRID_PADDING)
+        style_chooser.grid(row=1, column=1, columnspan=2, sticky='sw',
+                           **GRID_PADDING)
+        font_label.grid(row=2, column=0, sticky='se', **GRID_PADDING)
+        font_chooser.grid(row=2, column=1, columnspan=2, sticky='sw',
+                          **GRID_PADDING)
+        size_label.grid(row=3, column=0, sticky='e', **GRID_PADDING)
+        size_chooser.grid(row=3, column=1, columnspan=2, sticky='w',
+                          **GRID_PADDING)
+        colour_label.grid(row=4, column=0, sticky='e', **GRID_PADDING)
+        colour_box.grid(row=4, column=1, sticky='w', **GRID_PADDING)
+        colour_picker.grid(row=4, column=2, sticky='w', **GRID_PADDING)
+        badges_label.grid(row=5, column=0, sticky='e', **GRID_PADDING)
+        badges_option.grid(row=5, column=1, columnspan=2, sticky='w',
+                           **GRID_PADDING)
+        timeout_label.grid(row=6, column=0, sticky='e', **GRID_PADDING)
+        timeout_option.grid(row=6, column=1, columnspan=2, sticky='w',
+                            **GRID_PADDING)
+        bttv_label.grid(row=7, column=0, sticky='e', **GRID_PADDING)
+        bttv_option.grid(row=7, column=1, columnspan=2, sticky='w',
+                         **GRID_PADDING)
+        pronoun_label.grid(row=8, column=0, sticky='e', **GRID_PADDING)
+        pronoun_option.grid(row=8, column=1, columnspan=2, sticky='w',
+                            **GRID_PADDING)
+        pronoun_font_label.grid(row=9, column=0, sticky='e', **GRID_PADDING)
+        pronoun_font.grid(row=9, column=1, sticky='w', **GRID_PADDING)
+        pronoun_colour_label.grid(row=10, column=0, sticky='e', **GRID_PADDING)
+        pronoun_colour.grid(row=10, column=1, sticky='w', **GRID_PADDING)
+        pronoun_colour_picker.grid(row=10, column=2, sticky='w',
+                                   **GRID_PADDING)
+        custom_css_label.grid(row=11, column=0, sticky='e', **GRID_PADDING)
         custom_css_option.grid(row=11, column=1, columnspan=2, sticky='w',
-                               pady=5, padx=5)
-        css_file_label.grid(row=12, column=0, sticky='e', pady=5, padx=5)
+                               **GRID_PADDING)
+        css_file_label.grid(row=12, column=0, sticky='e', **GRID_PADDING)
         css_file_picker.grid(row=12, column=1, columnspan=2, sticky='w',
-                             pady=5, padx=5)
+                             **GRID_PADDING)
         css_chosen_file_label.grid(row=13, column=1, columnspan=2,
-                                   sticky='w', pady=5, padx=5)
-        save_config_btn.grid(row=14, column=2, sticky='es', pady=5, padx=5)
+                                   sticky='w', **GRID_PADDING)
+        save_config_btn.grid(row=14, column=2, sticky='es', **GRID_PADDING)
 
     def _save_config_values(self) -> None:
         """Save the Twitch OAuth values to the config file
         """
-        config = load_config('chat_overlay.ini')
-        config['DEFAULT']['chat_font'] = self.chat_font.get()
-        config['DEFAULT']['font_size'] = self.font_size.get()
-        config['DEFAULT']['font_colour'] = self.font_colour.get()
-        config['DEFAULT']['badges_option'] = str(self.badges_option.get())
-        config['DEFAULT']['timeout_message'] = str(self.timeout_option.get())
-        config['DEFAULT']['bttv_option'] = str(self.bttv_option.get())
-        config['DEFAULT']['pronoun_option'] = str(self.pronoun_option.get())
-        config['DEFAULT']['pronoun_font'] = self.pronoun_font.get()
-        config['DEFAULT']['pronoun_colour'] = self.pronoun_colour.get()
-        config['DEFAULT']['chat_style'] = self.chat_style.get()
-        config['DEFAULT']['custom_css'] = str(self.custom_css.get())
-        config['DEFAULT']['custom_css_path'] = self.custom_css_path.get()
+        values = {
+            'chat_font': self.chat_font.get(),
+            'font_size': self.font_size.get(),
+            'font_colour': self.font_colour.get(),
+            'badges_option': str(self.badges_option.get()),
+            'timeout_message': str(self.timeout_option.get()),
+            'bttv_option': str(self.bttv_option.get()),
+            'pronoun_option': str(self.pronoun_option.get()),
+            'pronoun_font': self.pronoun_font.get(),
+            'pronoun_colour': self.pronoun_colour.get(),
+            'chat_style': self.chat_style.get(),
+            'custom_css': str(self.custom_css.get()),
+            'custom_css_path': self.custom_css_path.get()
+        }
+        config = self._config
+        # Don't rewrite the file if nothing has changed since the last save
+        if all(config['DEFAULT'].get(key) == value
+               for key, value in values.items()):
+            self.logger.debug('chat_overlay.tk.py: No config changes to save')
+            return
+        config['DEFAULT'].update(values)
         save_config(config, 'chat_overlay.ini')
 
     def _load_config_values(self) -> None:
         """Save the Twitch OAuth values to the config file
         """
-        config = load_config('chat_overlay.ini')
-        self.chat_font.set(config['DEFAULT'].get('chat_font', 'Arial'))
-        self.font_size.set(config['DEFAULT'].get('font_size', '16px'))
-        self.font_colour.set(config['DEFAULT'].get('font_colour', 'white'))
-        self.badges_option.set(eval(config['DEFAULT'].get('badges_option',
-                                                          'True')))
-        self.timeout_option.set(int(config['DEFAULT'].get('timeout_message',
-                                                          '0')))
-        self.bttv_option.set(eval(config['DEFAULT'].get('bttv_option', 'True')))
-        self.pronoun_option.set(eval(config['DEFAULT'].get('pronoun_option',
-                                                           'True')))
-        self.pronoun_font.set(config['DEFAULT'].get('pronoun_font',
-                                                    'Courier New'))
-        self.pronoun_colour.set(config['DEFAULT'].get('pronoun_colour',
-                                                      'lightgray'))
-        self.chat_style.set(config['DEFAULT'].get('chat_style', 'Default Nrrd'))
-        self.custom_css.set(eval(config['DEFAULT'].get('custom_css', 'False')))
-        self.custom_css_path.set(config['DEFAULT'].get('custom_css_path', ''))
+        options = self._config['DEFAULT']
+        self.chat_font.set(options.get('chat_font', 'Arial'))
+        self.font_size.set(options.get('font_size', '16px'))
+        self.font_colour.set(options.get('font_colour', 'white'))
+        self.badges_option.set(options.getboolean('badges_option', True))
+        self.timeout_option.set(options.getint('timeout_message', 0))
+        self.bttv_option.set(options.getboolean('bttv_option', True))
+        self.pronoun_option.set(options.getboolean('pronoun_option', True))
+        self.pronoun_font.set(options.get('pronoun_font', 'Courier New'))
+        self.pronoun_colour.set(options.get('pronoun_colour', 'lightgray'))
+        self.chat_style.set(options.get('chat_style', 'Default Nrrd'))
+        self.custom_css.set(options.getboolean('custom_css', False))
+        self.custom_css_path.set(options.get('custom_css_path', ''))
 
     def _font_colour_chooser(self) -> None:
         """Launch a colour picker for the main Font"""
@@ -262,31 +282,19 @@ class PluginOptions(ttk.Frame):
 
     def _css_file_chooser(self) -> None:
         """Launch a file picker for custom CSS"""
-        filetypes = (('CSS files', '*.css'), ('All files', '*.*'))
         self.custom_css_path.set(
             filedialog.askopenfilename(title='Select CSS File',
-                                       filetypes=filetypes)
+                                       filetypes=CSS_FILETYPES)
         )
 
     def _enable_pronoun_options(self) -> None:
         """Enable widgets related to the Pronoun options"""
-        pronoun_widgets = [(x, y) for x, y in
-                           self.scrollable_frame.children.items()
-                           if 'pronoun' in x]
-        if self.pronoun_option.get():
-            for widget in pronoun_widgets:
-                widget[1].config(state='normal')
-        else:
-            for widget in pronoun_widgets:
-                widget[1].config(state='disabled')
+        state = 'normal' if self.pronoun_option.get() else 'disabled'
+        for widget in self._pronoun_widgets:
+            widget.config(state=state)
 
     def _enable_css_options(self) -> None:
         """Enable widgets related to the customer CSS options"""
-        css_widgets = [(x, y) for x, y in self.scrollable_frame.children.items()
-                       if 'css' in x]
-        if self.custom_css.get():
-            for widget in css_widgets:
-                widget[1].config(state='normal')
-        else:
-            for widget in css_widgets:
-                widget[1].config(state='disabled')
+        state = 'normal' if self.custom_css.get() else 'disabled'
+        for widget in self._css_widgets:
+            widget.config(state=state)
@@ -1,54 +1,88 @@
 """Run the main web server and websocket components as asyncio tasks
 """
-from typing import List, Union, Type
+from typing import List, Optional, Type
 from logging import Logger
 import asyncio
 import signal
 import threading
-from functools import partial
-from asyncio import PriorityQueue, Event
+from asyncio import Queue
 from nrrd_twitch_bot.lib.twitch_chat import TwitchChat
 from nrrd_twitch_bot.lib.config import load_default_config
 from nrrd_twitch_bot.lib.dispatcher import Dispatcher
 from nrrd_twitch_bot.lib.plugins import load_plugins, BasePlugin
 from nrrd_twitch_bot.lib.http_server import OverlayServer
+from nrrd_twitch_bot.lib.twitch_helix import TwitchHelix
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
 
 
-def start_new_thread(logger: Logger, shutdown_event: Event) -> None:
+def new_event_loop() -> asyncio.AbstractEventLoop:
+    """Create an event loop for the services, using uvloop where it is
+    installed
+
+    :return: The new event loop
+    """
+    if uvloop:
+        return uvloop.new_event_loop()
+    return asyncio.new_event_loop()
+
+
+def start_new_thread(logger: Logger) -> asyncio.AbstractEventLoop:
     """Create a new thread to run the asyncio tasks in
 
     :param logger: A Logger object
-    :param shutdown_event: An asyncio event to trigger shutting down the
-        services
+    :return: The asyncio event loop the services will run on, to be passed
+        to stop_thread()
     """
-    start_services = partial(run_async_tasks, logger, shutdown_event)
+    loop = new_event_loop()
     logger.debug('run.py: Starting thread for websockets')
-    services = threading.Thread(target=start_services, daemon=True)
+    services = threading.Thread(target=run_async_tasks, args=(logger, loop),
+                                daemon=True)
     services.start()
+    return loop
 
 
-async def run_chat(chat_rcv_queue: PriorityQueue,
-                   chat_send_queue: PriorityQueue,
+def stop_thread(loop: asyncio.AbstractEventLoop, logger: Logger) -> None:
+    """Signal the services running in another thread to shut down. The loop
+    will be closed once the shutdown has finished
+
+    :param loop: The asyncio event loop returned by start_new_thread()
+    :param logger: A Logger object
+    """
+    if loop.is_closed():
+        return
+    logger.debug('run.py: Scheduling shutdown on the services thread')
+    # asyncio objects aren't thread safe, so hand the shutdown over to the
+    # loop's own thread
+    asyncio.run_coroutine_threadsafe(shutdown(loop, logger), loop)
+
+
+async def run_chat(oauth_token: str,
+                   nickname: str,
+                   channel: str,
+                   chat_rcv_queue: Queue,
+                   chat_send_queue: Queue,
                    logger: Logger) -> None:
     """Run the Twitch chat service as an asyncio task
 
+    :param oauth_token: The OAuth token to log in to Twitch chat with
+    :param nickname: The Twitch username for the bot
+    :param channel: The Twitch channel to join
     :param chat_rcv_queue: The queue for passing messages received from
         twitch chat to the dispatcher
     :param chat_send_queue: The queue for passing messages back to twitch chat
     :param logger: A logger object
     """
-    config = load_default_config(logger)
-    oauth_token = config['twitch']['oauth_token']
-    nickname = config['twitch']['username']
-    channel = config['twitch']['channel']
     logger.info('run.py: Starting twitch chat service')
     async with TwitchChat(oauth_token, nickname, channel, chat_rcv_queue,
                           chat_send_queue, logger) as chat:
         await chat.run()
 
 
-async def run_dispatcher(chat_rcv_queue: PriorityQueue,
-                         chat_send_queue: PriorityQueue,
+async def run_dispatcher(chat_rcv_queue: Queue,
+                         chat_send_queue: Queue,
                          plugins: List[BasePlugin],
                          logger: Logger) -> None:
     """Run the dispatcher service as an asyncio task
@@ -76,14 +110,13 @@ async def run_http(plugins: List[BasePlugin], logger: Logger) -> None:
 
 
 async def run_plugins(plugin: Type[BasePlugin], logger: Logger) -> None:
-    """Run any plugins that implement the run() method
+    """Run a plugin that implements the run() method
 
     :param plugin: The plugin object
     :param logger:
     """
-    if hasattr(plugin, 'run'):
-        logger.debug(f"run.py: running plugin {plugin}")
-        await plugin.run()
+    logger.debug('run.py: running plugin %s', plugin)
+    await plugin.run()
 
 
 async def shutdown(loop: asyncio.AbstractEventLoop, logger: Logger) \
@@ -93,29 +126,16 @@ async def shutdown(loop: asyncio.AbstractEventLoop, logger: Logger) \
     :param loop: The asyncio event loop
     :param logger: A logger object
     """
-    tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+    current = asyncio.current_task()
+    tasks = [t for t in asyncio.all_tasks() if t is not current]
     for task in tasks:
         task.cancel()
-    logger.debug(f"run.py: Cancelling {len(tasks)} outstanding tasks")
+    logger.debug('run.py: Cancelling %d outstanding tasks', len(tasks))
     await asyncio.gather(*tasks, return_exceptions=True)
+    await TwitchHelix.close_shared()
     loop.stop()
 
 
-async def shutdown_on_event(shutdown_event: Event,
-                            loop: asyncio.AbstractEventLoop,
-                            logger: Logger) -> None:
-    """Listen for an asyncio event from the TK app to trigger a shutdown
-
-    :param shutdown_event: The asyncio Event
-    :param loop: The asyncio event loop
-    :param logger: A logger object
-    """
-    await shutdown_event.wait()
-    logger.debug('run.py: Shutdown event received')
-    await shutdown(loop, logger)
-    shutdown_event.clear()
-
-
 def register_signal_handlers(loop: asyncio.AbstractEventLoop,
                              logger: Logger) -> None:
     """Register shutdown signals and the shutdown handlers to the event loop
@@ -126,38 +146,50 @@ def register_signal_handlers(loop: asyncio.AbstractEventLoop,
     # Register the signal handlers
     signals = (signal.SIGHUP, signal.SIGTERM, signal.SIGINT)
     for sig in signals:
-        logger.debug(f"run.py: Adding handler for signal {sig}")
+        logger.debug('run.py: Adding handler for signal %s', sig)
         loop.add_signal_handler(
             sig, lambda: asyncio.create_task(shutdown(loop, logger))
         )
 
 
-def run_async_tasks(logger: Logger, shutdown_event: Union[Event, None] = None) \
-        -> None:
+def run_async_tasks(logger: Logger,
+                    loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
     """Start all the services as asyncio tasks and run the event loop
 
     :param logger: A logger object
-    :param shutdown_event: An asyncio Event object used by the main TK thread
-        to signal a shutdown of the event loop
+    :param loop: The event loop to run the services on, when running in a
+        thread created by start_new_thread(). If not given a new loop is
+        created and shutdown is handled by signals instead
     """
+    threaded = loop is not None
+    if not threaded:
+        loop = new_event_loop()
     # Setup async queues
-    chat_rcv_queue = PriorityQueue()
-    chat_send_queue = PriorityQueue()
-    # Gather the plugins
-    plugins = load_plugins(logger)
-    # Get the loop
-    loop = asyncio.new_event_loop()
+    chat_rcv_queue = Queue()
+    chat_send_queue = Queue()
     try:
-        loop.create_task(run_chat(chat_rcv_queue, chat_send_queue, logger))
-        loop.create_task(run_dispatcher(chat_rcv_queue, chat_send_queue,
-                                        plugins, logger))
-        loop.create_task(run_http(plugins, logger))
-        if shutdown_event:
-            loop.create_task(shutdown_on_event(shutdown_event, loop, logger))
-        else:
+        config = load_default_config(logger)
+        # Gather the plugins
+        plugins = load_plugins(logger)
+        # The event loop only keeps weak references to tasks, so hold on to
+        # the services until the loop stops
+        tasks = [
+            loop.create_task(run_chat(config['twitch']['oauth_token'],
+                                      config['twitch']['username'],
+                                      config['twitch']['channel'],
+                                      chat_rcv_queue, chat_send_queue,
+                                      logger)),
+            loop.create_task(run_dispatcher(chat_rcv_queue, chat_send_queue,
+                                            plugins, logger)),
+            loop.create_task(run_http(plugins, logger))
+        ]
+        if not threaded:
+            # Signal handlers can only be added from the main thread
             register_signal_handlers(loop, logger)
+        # Only plugins with a run() method need a task of their own
         for plugin in plugins:
-            loop.create_task(run_plugins(plugin, logger))
+            if hasattr(plugin, 'run'):
+                tasks.append(loop.create_task(run_plugins(plugin, logger)))
         loop.run_forever()
     finally:
         loop.close()
@@ -0,0 +1,86 @@
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+from configparser import ConfigParser
+import asyncio
+import logging
+from nrrd_twitch_bot.plugins.chat_overlay.plugin import ChatOverlay
+
+OVERLAY_CONFIG = {'chat_font': 'Arial', 'font_size': '16px',
+                  'font_colour': 'white', 'badges_option': 'False',
+                  'timeout_message': '0', 'bttv_option': 'True',
+                  'pronoun_option': 'False', 'chat_style': 'Default Nrrd',
+                  'custom_css': 'False', 'custom_css_path': ''}
+
+
+def overlay_config(file_name):
+    config = ConfigParser()
+    config['DEFAULT'] = OVERLAY_CONFIG
+    return config
+
+
+class FakeBttv:
+    """Stands in for the AsyncBttv client, returning or raising whatever the
+    test gives it"""
+
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+
+    async def get_channel_emotes(self, channel_id):
+        self.calls += 1
+        if isinstance(self.result, BaseException):
+            raise self.result
+        return self.result
+
+
+class TestBttvCache(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        with patch('nrrd_twitch_bot.plugins.chat_overlay.plugin.load_config',
+                   overlay_config):
+            self.plugin = ChatOverlay(logging.getLogger('chat_overlay_test'))
+
+    async def test_update(self):
+        self.plugin._bttv = FakeBttv(
+            {'channelEmotes': [{'code': 'Kappa2', 'id': 'abc'}]})
+        await self.plugin._update_bttv_cache('1')
+        self.assertEqual(list(self.plugin.bttv_html), ['Kappa2'])
+        self.assertEqual(self.plugin._bttv_channel_id, '1')
+
+    async def test_errors_are_contained(self):
+        errors = [asyncio.TimeoutError(), KeyError('id'),
+                  ValueError('bad json')]
+        for error in errors:
+            with self.subTest(error=error):
+                self.plugin._bttv = FakeBttv(error)
+                self.plugin._bttv_cache_time = 0.0
+                with self.assertLogs('chat_overlay_test', 'WARNING'):
+                    await self.plugin._update_bttv_cache('2')
+                self.assertEqual(self.plugin.bttv_html, {})
+                # The failure still counts as a refresh, so the next message
+                # doesn't start another one
+                self.assertEqual(self.plugin._bttv_channel_id, '2')
+                self.assertGreater(self.plugin._bttv_cache_time, 0.0)
+                self.assertIsNone(self.plugin._check_bttv_cache('2'))
+
+    async def test_programming_errors_propagate(self):
+        self.plugin._bttv = FakeBttv(TypeError('bug'))
+        with self.assertRaises(TypeError):
+            await self.plugin._update_bttv_cache('5')
+        self.assertEqual(self.plugin._bttv_channel_id, '5')
+
+    async def test_unexpected_payload(self):
+        self.plugin._bttv = FakeBttv({'channelEmotes': [{'code': 'NoId'}]})
+        with self.assertLogs('chat_overlay_test', 'WARNING'):
+            await self.plugin._update_bttv_cache('3')
+        self.assertEqual(self.plugin.bttv_html, {})
+        self.assertEqual(self.plugin._bttv_channel_id, '3')
+
+    async def test_failure_keeps_channel_emotes(self):
+        self.plugin._bttv = FakeBttv(
+            {'channelEmotes': [{'code': 'Kappa2', 'id': 'abc'}]})
+        await self.plugin._update_bttv_cache('4')
+        self.plugin._bttv = FakeBttv(asyncio.TimeoutError())
+        with self.assertLogs('chat_overlay_test', 'WARNING'):
+            await self.plugin._update_bttv_cache('4')
+        self.assertEqual(list(self.plugin.bttv_html), ['Kappa2'])
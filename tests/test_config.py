@@ -7,6 +7,9 @@ from nrrd_twitch_bot.lib.config import load_default_config, check_config_dir
 APP_DIR = 'nrrd-twitch-bot'
 AUTHOR_DIR = 'djnrrd'
 INI_FILE = 'nrrd-twitch-bot.ini'
+CONFIG_DIR = user_config_dir(APP_DIR, AUTHOR_DIR)
+CONFIG_FILE = os.path.join(CONFIG_DIR, INI_FILE)
+AUTHOR_PATH = os.path.join(user_config_dir(), AUTHOR_DIR)
 
 
 class TestConfigs(TestCase):
@@ -21,28 +24,23 @@ class TestConfigs(TestCase):
 
     @staticmethod
     def file_backup():
-        config_dir = user_config_dir(APP_DIR, AUTHOR_DIR)
-        config_file = os.path.join(config_dir, INI_FILE)
-        if os.path.isfile(config_file):
-            with open(config_file, 'r') as f:
+        if os.path.isfile(CONFIG_FILE):
+            with open(CONFIG_FILE, 'r') as f:
                 ret_file = f.read()
             return ret_file
         return None
 
     def file_restore(self):
-        config_dir = check_config_dir()
-        config_file = os.path.join(config_dir, INI_FILE)
-        with open(config_file, 'w') as f:
+        # Recreates the directories if a test removed them
+        check_config_dir()
+        with open(CONFIG_FILE, 'w') as f:
             f.write(self.config_file_backup)
 
     @staticmethod
     def delete_files():
-        config_dir = user_config_dir(APP_DIR, AUTHOR_DIR)
-        config_file = os.path.join(config_dir, INI_FILE)
-        author_dir = os.path.join(user_config_dir(), AUTHOR_DIR)
-        os.remove(config_file)
-        os.rmdir(config_dir)
-        os.rmdir(author_dir)
+        os.remove(CONFIG_FILE)
+        os.rmdir(CONFIG_DIR)
+        os.rmdir(AUTHOR_PATH)
 
     def test_load_conf(self):
         config = load_default_config(self.logger)
@@ -52,9 +50,6 @@ class TestConfigs(TestCase):
 
     def test_default_conf(self):
         self.delete_files()
-        config_dir = user_config_dir('nrrd-twitch-bot', 'djnrrd')
-        config_file = os.path.join(config_dir, 'nrrd-twitch-bot.ini')
-        author_dir = os.path.join(user_config_dir(), 'djnrrd')
         config = load_default_config(self.logger)
         self.assertTrue(config.has_section('twitch'))
         self.assertTrue(config.has_option('twitch', 'oauth_token'))
@@ -67,6 +62,6 @@ class TestConfigs(TestCase):
         self.assertEqual(config.get('twitch', 'username'), 'N/A')
         self.assertEqual(config.get('plugins', 'plugins'),
                          'chat_commands:chat_overlay')
-        self.assertTrue(os.path.isfile(config_file))
-        self.assertTrue(os.path.isdir(config_dir))
-        self.assertTrue(os.path.isdir(author_dir))
+        self.assertTrue(os.path.isfile(CONFIG_FILE))
+        self.assertTrue(os.path.isdir(CONFIG_DIR))
+        self.assertTrue(os.path.isdir(AUTHOR_PATH))
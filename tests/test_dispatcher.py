@@ -0,0 +1,48 @@
+from unittest import TestCase
+from nrrd_twitch_bot.lib.dispatcher import Dispatcher
+
+
+class TestSplitMessage(TestCase):
+
+    def test_tagged(self):
+        message = '@badge-info=;badges=broadcaster/1;color=#FF0000;' \
+                  'display-name=DJNrrd;emotes=;turbo :djnrrd!djnrrd@' \
+                  'djnrrd.tmi.twitch.tv PRIVMSG #djnrrd :Hello chat\r\n'
+        tag_dict, irc_user_server, command_text = \
+            Dispatcher._split_message(message, 'PRIVMSG')
+        self.assertEqual(tag_dict['badge-info'], '')
+        self.assertEqual(tag_dict['badges'], 'broadcaster/1')
+        self.assertEqual(tag_dict['color'], '#FF0000')
+        self.assertEqual(tag_dict['display-name'], 'DJNrrd')
+        # Tags don't have to have a value
+        self.assertEqual(tag_dict['turbo'], '')
+        self.assertEqual(irc_user_server,
+                         'djnrrd!djnrrd@djnrrd.tmi.twitch.tv')
+        self.assertEqual(command_text, 'Hello chat')
+
+    def test_colon_in_text(self):
+        message = '@color=#FF0000;display-name=DJNrrd :djnrrd!djnrrd@' \
+                  'djnrrd.tmi.twitch.tv PRIVMSG #djnrrd :Stream at 12:30: ' \
+                  'see https://twitch.tv/djnrrd\r\n'
+        tag_dict, irc_user_server, command_text = \
+            Dispatcher._split_message(message, 'PRIVMSG')
+        self.assertEqual(tag_dict['display-name'], 'DJNrrd')
+        self.assertEqual(irc_user_server.split('!')[0], 'djnrrd')
+        self.assertEqual(command_text,
+                         'Stream at 12:30: see https://twitch.tv/djnrrd')
+
+    def test_untagged(self):
+        message = ':djnrrd!djnrrd@djnrrd.tmi.twitch.tv PRIVMSG #djnrrd ' \
+                  ':Hello: chat\r\n'
+        tag_dict, irc_user_server, command_text = \
+            Dispatcher._split_message(message, 'PRIVMSG')
+        self.assertEqual(tag_dict, {'': ''})
+        self.assertEqual(irc_user_server.split('!')[0], 'djnrrd')
+        self.assertEqual(command_text, 'Hello: chat')
+
+    def test_ping(self):
+        tag_dict, irc_user_server, command_text = \
+            Dispatcher._split_message('PING :tmi.twitch.tv\r\n', 'PING')
+        self.assertEqual(tag_dict, {'': ''})
+        self.assertEqual(irc_user_server, '')
+        self.assertEqual(command_text, 'tmi.twitch.tv')
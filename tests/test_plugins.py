@@ -0,0 +1,88 @@
+from unittest import IsolatedAsyncioTestCase
+import asyncio
+import json
+import logging
+from aiohttp import WSMsgType
+from nrrd_twitch_bot.lib.plugins import BasePlugin, JsonFrame, TextFrame, \
+    _dumps, _send_json_frames
+
+
+class FakeWebSocket:
+    """Records the frames that would be sent to an overlay"""
+
+    def __init__(self):
+        self.closed = False
+        self.frames = []
+
+    async def send_frame(self, message, opcode):
+        self.frames.append((opcode, bytes(message)))
+
+    async def send_bytes(self, data):
+        self.frames.append((WSMsgType.BINARY, data))
+
+
+class TestJsonFrames(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.ws = FakeWebSocket()
+        self.messages = [{'msg_type': 'privmsg', 'msg_text': 'Hello, "chat"'},
+                         {'msg_type': 'clearmsg', 'target-msg-id': '1'},
+                         {'msg_type': 'privmsg', 'msg_text': '[]{},:'}]
+
+    def test_dumps(self):
+        frame = _dumps(self.messages[0])
+        self.assertIsInstance(frame, JsonFrame)
+        self.assertEqual(json.loads(frame), self.messages[0])
+
+    async def test_single_frame(self):
+        await _send_json_frames(self.ws, [_dumps(self.messages[0])])
+        opcode, data = self.ws.frames[0]
+        self.assertEqual(opcode, WSMsgType.TEXT)
+        # A lone message is sent as the object, not an array of one
+        self.assertEqual(json.loads(data), self.messages[0])
+
+    async def test_array_frame(self):
+        await _send_json_frames(self.ws, [_dumps(x) for x in self.messages])
+        self.assertEqual(len(self.ws.frames), 1)
+        opcode, data = self.ws.frames[0]
+        self.assertEqual(opcode, WSMsgType.TEXT)
+        # overlay.js JSON.parses the frame and handles each array element
+        self.assertEqual(json.loads(data.decode('utf-8')), self.messages)
+
+    async def test_send_from_queue(self):
+        plugin = BasePlugin(logging.getLogger('plugins_test'))
+        plugin.ws_batch_size = 8
+        client_queue = asyncio.Queue()
+        for message in self.messages[:2]:
+            client_queue.put_nowait(_dumps(message))
+        client_queue.put_nowait(TextFrame(b'"text"'))
+        client_queue.put_nowait(_dumps(self.messages[2]))
+        task = asyncio.create_task(plugin._send_from_queue(self.ws,
+                                                           client_queue))
+        await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        # JSON messages are batched until a message of another type
+        frames = [json.loads(data) for _, data in self.ws.frames]
+        self.assertEqual(frames, [self.messages[:2], 'text',
+                                  self.messages[2]])
+
+
+class TestWebSocketClients(IsolatedAsyncioTestCase):
+
+    async def test_reconnect(self):
+        plugin = BasePlugin(logging.getLogger('plugins_test'))
+        old_ws = FakeWebSocket()
+        plugin._remove_ws_client(old_ws, plugin._add_ws_client(old_ws))
+        # The overlay reconnects before the loop has run the cancellations
+        ws = FakeWebSocket()
+        task = plugin._add_ws_client(ws)
+        await plugin.send_web_socket({'msg_type': 'privmsg'})
+        await asyncio.wait_for(plugin.websocket_queue.join(), 1)
+        await asyncio.sleep(0)
+        self.assertEqual(ws.frames, [(WSMsgType.TEXT, b'{"msg_type":'
+                                                      b'"privmsg"}')])
+        self.assertEqual(old_ws.frames, [])
+        plugin._remove_ws_client(ws, task)
+        await asyncio.sleep(0)
+        self.assertIsNone(plugin._ws_broadcast)
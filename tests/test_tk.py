@@ -1,22 +1,30 @@
 from unittest import TestCase
+from tempfile import TemporaryDirectory
+import pathlib
 from nrrd_twitch_bot.lib.tk import TwitchBotLogApp
 from tkinter import Text
 from logging import Logger
-from asyncio import PriorityQueue, AbstractEventLoop
 
 
 class TestTwitchBotLogApp(TestCase):
 
     # this will run on a separate thread.
-    async def _start_app(self):
-        self.app.mainloop()
-
-    def setUp(self):
-        self.app = TwitchBotLogApp(False)
-        self._start_app()
-
-    def tearDown(self):
-        self.app.destroy()
+    @classmethod
+    async def _start_app(cls):
+        cls.app.mainloop()
+
+    # Building the Tk app is slow, so the tests share one
+    @classmethod
+    def setUpClass(cls):
+        cls.log_dir = TemporaryDirectory()
+        log_file_path = pathlib.Path(cls.log_dir.name, 'twitch_bot.log')
+        cls.app = TwitchBotLogApp(False, log_file_path)
+        cls._start_app()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.app.destroy()
+        cls.log_dir.cleanup()
 
     def test_startup(self):
         title = self.app.winfo_toplevel().title()
@@ -29,8 +37,6 @@ class TestTwitchBotLogApp(TestCase):
     def test_logger(self):
         self.assertIsInstance(self.app.logger, Logger)
 
-    def test_loop(self):
-        self.assertIsInstance(self.app.loop, AbstractEventLoop)
-
-    def test_queue(self):
-        self.assertIsInstance(self.app.shutdown_queue, PriorityQueue)
+    def test_services_loop(self):
+        # The services only get an event loop once they are launched
+        self.assertIsNone(self.app.services_loop)
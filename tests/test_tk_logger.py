@@ -2,27 +2,37 @@ from unittest import TestCase
 import _tkinter
 from logging import Logger, DEBUG, INFO
 from datetime import datetime
+from tempfile import TemporaryDirectory
+import pathlib
 from nrrd_twitch_bot.lib.tk import TwitchBotLogApp
 
 
 class TestTwitchBotLoggerDebug(TestCase):
 
     # this will run on a separate thread.
-    async def _start_app(self):
-        self.app.mainloop()
-
-    def setUp(self):
-        self.app = TwitchBotLogApp(True)
-        self.pump_events()
-        self.logger = self.app.logger
-        self._start_app()
-
-    def tearDown(self):
-        self.app.destroy()
-        self.pump_events()
-
-    def pump_events(self):
-        while self.app.dooneevent(_tkinter.ALL_EVENTS | _tkinter.DONT_WAIT):
+    @classmethod
+    async def _start_app(cls):
+        cls.app.mainloop()
+
+    # Building the Tk app is slow, so the tests share one per class
+    @classmethod
+    def setUpClass(cls):
+        cls.log_dir = TemporaryDirectory()
+        log_file_path = pathlib.Path(cls.log_dir.name, 'twitch_bot.log')
+        cls.app = TwitchBotLogApp(True, log_file_path)
+        cls.pump_events()
+        cls.logger = cls.app.logger
+        cls._start_app()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.app.destroy()
+        cls.pump_events()
+        cls.log_dir.cleanup()
+
+    @classmethod
+    def pump_events(cls):
+        while cls.app.dooneevent(_tkinter.ALL_EVENTS | _tkinter.DONT_WAIT):
             pass
 
     def test_logger(self):
@@ -36,6 +46,10 @@ class TestTwitchBotLoggerDebug(TestCase):
 
     def test_handlers(self):
         self.pump_events()
+        # Start from an empty log, whatever earlier tests wrote
+        self.app.bot_log.configure(state='normal')
+        self.app.bot_log.delete('1.0', 'end')
+        self.app.bot_log.configure(state='disabled')
         time_str = datetime.now().strftime('%H:%M:%S')
         self.logger.debug('Debug message')
         self.logger.info('Info message')
@@ -52,21 +66,29 @@ class TestTwitchBotLoggerDebug(TestCase):
 class TestTwitchBotLoggerInfo(TestCase):
 
     # this will run on a separate thread.
-    async def _start_app(self):
-        self.app.mainloop()
-
-    def setUp(self):
-        self.app = TwitchBotLogApp(False)
-        self.pump_events()
-        self.logger = self.app.logger
-        self._start_app()
-
-    def tearDown(self):
-        self.app.destroy()
-        self.pump_events()
-
-    def pump_events(self):
-        while self.app.dooneevent(_tkinter.ALL_EVENTS | _tkinter.DONT_WAIT):
+    @classmethod
+    async def _start_app(cls):
+        cls.app.mainloop()
+
+    # Building the Tk app is slow, so the tests share one per class
+    @classmethod
+    def setUpClass(cls):
+        cls.log_dir = TemporaryDirectory()
+        log_file_path = pathlib.Path(cls.log_dir.name, 'twitch_bot.log')
+        cls.app = TwitchBotLogApp(False, log_file_path)
+        cls.pump_events()
+        cls.logger = cls.app.logger
+        cls._start_app()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.app.destroy()
+        cls.pump_events()
+        cls.log_dir.cleanup()
+
+    @classmethod
+    def pump_events(cls):
+        while cls.app.dooneevent(_tkinter.ALL_EVENTS | _tkinter.DONT_WAIT):
             pass
 
     def test_logger(self):
@@ -80,6 +102,10 @@ class TestTwitchBotLoggerInfo(TestCase):
 
     def test_handlers(self):
         self.pump_events()
+        # Start from an empty log, whatever earlier tests wrote
+        self.app.bot_log.configure(state='normal')
+        self.app.bot_log.delete('1.0', 'end')
+        self.app.bot_log.configure(state='disabled')
         time_str = datetime.now().strftime('%H:%M:%S')
         self.logger.debug('Debug message')
         self.logger.info('Info message')
@@ -0,0 +1,99 @@
+from unittest import TestCase, IsolatedAsyncioTestCase
+from unittest.mock import patch
+from nrrd_twitch_bot.lib.twitch_helix import TTLCache, TwitchHelix
+
+
+class TestTTLCache(TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = patch('nrrd_twitch_bot.lib.twitch_helix.time.monotonic',
+                        lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = TTLCache(60.0, 2)
+
+    def test_get(self):
+        self.cache.set('a', 1)
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertIsNone(self.cache.get('b'))
+
+    def test_ttl_expiry(self):
+        self.cache.set('a', 1)
+        self.now += 59.0
+        self.assertEqual(self.cache.get('a'), 1)
+        self.now += 1.0
+        self.assertIsNone(self.cache.get('a'))
+        # Expired entries are dropped, not just hidden
+        self.assertNotIn('a', self.cache._entries)
+
+    def test_set_refreshes_ttl(self):
+        self.cache.set('a', 1)
+        self.now += 50.0
+        self.cache.set('a', 2)
+        self.now += 50.0
+        self.assertEqual(self.cache.get('a'), 2)
+
+    def test_lru_eviction(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        # Reading 'a' makes 'b' the least recently used
+        self.cache.get('a')
+        self.cache.set('c', 3)
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('c'), 3)
+
+
+class FakeHelix(TwitchHelix):
+    """A TwitchHelix client that answers requests from a canned response
+    rather than calling Twitch"""
+
+    def __init__(self, data):
+        super().__init__('client_id', 'oauth_token')
+        # Don't share the class cache with other tests
+        self._emote_set_cache = TTLCache(60.0, 16)
+        self.data = data
+        self.requests = []
+
+    async def _transaction(self, method, path, **kwargs):
+        self.requests.append(kwargs['params'])
+        return {'data': self.data}
+
+
+class TestEmoteSetsBatch(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.emotes = [{'id': '10', 'emote_set_id': '1'},
+                       {'id': '30', 'emote_set_id': '3'},
+                       {'id': '11', 'emote_set_id': '1'},
+                       {'id': '40', 'emote_set_id': '4'}]
+        self.helix = FakeHelix(self.emotes)
+
+    async def test_regroup(self):
+        result = await self.helix.get_emote_sets_batch(['3', '2', '1'])
+        # Sets come back in the order requested, including empty ones, and
+        # emotes for sets that weren't asked for are ignored
+        expected = [[self.emotes[1]], [], [self.emotes[0], self.emotes[2]]]
+        self.assertEqual(result, expected)
+        self.assertEqual(self.helix.requests, [[('emote_set_id', '3'),
+                                                ('emote_set_id', '2'),
+                                                ('emote_set_id', '1')]])
+
+    async def test_empty_sets_are_cached(self):
+        await self.helix.get_emote_sets_batch(['1', '2'])
+        result = await self.helix.get_emote_sets_batch(['2', '1'])
+        self.assertEqual(result, [[], [self.emotes[0], self.emotes[2]]])
+        self.assertEqual(len(self.helix.requests), 1)
+
+    async def test_only_missing_sets_requested(self):
+        await self.helix.get_emote_sets_batch(['1'])
+        result = await self.helix.get_emote_sets_batch(['1', '4'])
+        self.assertEqual(result, [[self.emotes[0], self.emotes[2]],
+                                  [self.emotes[3]]])
+        self.assertEqual(self.helix.requests[1], [('emote_set_id', '4')])
+
+    async def test_no_data(self):
+        self.helix.data = None
+        result = await self.helix.get_emote_sets_batch(['1', '2'])
+        self.assertEqual(result, [[], []])